@@ -1,5 +1,10 @@
 import os
 
+from dotenv import load_dotenv
+
+# .env is loaded once, before the first setting is read
+load_dotenv()
+
 
 class Settings:
     def __init__(self) -> None:
@@ -10,6 +15,52 @@ class Settings:
         )
         self.ark_model = os.getenv("ARK_MODEL_ID", "doubao-seed-2-0-pro-260215")
         self.data_dir = os.getenv("DATA_DIR", "")
+        # Database: DATABASE_URL overrides the MYSQL_* settings; replicas take reads
+        self.database_url = os.getenv("DATABASE_URL", "")
+        self.database_replica_urls = [
+            url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+        ]
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+        # Startup: connections opened per engine before serving, how long startup waits for the
+        # warmup (it continues in the background after that), and the /api/ready DB check timeout
+        self.db_pool_warmup = int(os.getenv("DB_POOL_WARMUP", str(self.db_pool_size)))
+        self.warmup_timeout = float(os.getenv("WARMUP_TIMEOUT", "60"))
+        self.ready_check_timeout = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
+        # LLM execution: concurrent upstream calls and per-call timeouts (seconds)
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT", "30"))
+        self.llm_stream_timeout = float(os.getenv("LLM_STREAM_TIMEOUT", "120"))
+        # Cache of generated recommendation reasons
+        self.reason_cache_size = int(os.getenv("REASON_CACHE_SIZE", "1024"))
+        self.reason_cache_ttl = float(os.getenv("REASON_CACHE_TTL", "600"))
+        # SSE: "auto" uses orjson when installed, else the stdlib encoder; LLM tokens are merged per interval
+        self.sse_serializer = os.getenv("SSE_SERIALIZER", "auto")
+        self.sse_flush_interval_ms = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "20"))
+        # Seconds between persisted checkpoints of the in-memory metrics
+        self.metrics_checkpoint_interval = float(os.getenv("METRICS_CHECKPOINT_INTERVAL", "60"))
+        # Write-behind feedback: flush every N ms or once M events are pending
+        self.feedback_flush_interval_ms = int(os.getenv("FEEDBACK_FLUSH_INTERVAL_MS", "200"))
+        self.feedback_flush_max_events = int(os.getenv("FEEDBACK_FLUSH_MAX_EVENTS", "500"))
+        # Hard cap on buffered events; beyond it feedback is written through synchronously
+        self.feedback_max_pending = int(os.getenv("FEEDBACK_MAX_PENDING", "50000"))
+        # Per-user recommendation result cache ("memory" or "redis")
+        self.rec_cache_backend = os.getenv("REC_CACHE_BACKEND", "memory")
+        self.rec_cache_size = int(os.getenv("REC_CACHE_SIZE", "10000"))
+        self.rec_cache_ttl = float(os.getenv("REC_CACHE_TTL", "300"))
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        # Max age (seconds) of a precomputed_recs row that may still be served; 0 disables
+        self.precomputed_max_age = float(os.getenv("PRECOMPUTED_MAX_AGE", "86400"))
+        # Per-stage latency histograms and per-request SQL counts on /metrics/prometheus
+        self.tracing_enabled = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+        # Per-request sampling profiler: disabled without an admin token; one profile per interval (seconds)
+        self.profiler_admin_token = os.getenv("PROFILER_ADMIN_TOKEN", "")
+        self.profiler_interval_ms = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+        self.profiler_min_interval = float(os.getenv("PROFILER_MIN_INTERVAL", "30"))
+        self.profiler_max_seconds = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
 
 
 settings = Settings()
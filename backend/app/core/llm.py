@@ -1,28 +1,134 @@
-from typing import List, Dict, AsyncGenerator
-from volcenginesdkarkruntime import Ark
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, AsyncGenerator, Optional
 
 from app.core.config import settings
+from app.core.tracing import observe, record_llm_stream, span
+
+# The Ark client is synchronous. Every upstream call runs on this bounded pool so
+# a slow LLM response never blocks the event loop; the semaphore caps in-flight calls.
+# A slot belongs to the worker thread, not the awaiting coroutine: it is released when
+# the thread finishes, so a timed-out or abandoned call still counts until the SDK returns.
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_client: Any = None
+_STREAM_END = object()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.llm_max_concurrency, thread_name_prefix="llm"
+        )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+    return _semaphore
+
+
+async def _submit(fn: Callable[..., Any], *args: Any) -> "Future[Any]":
+    """Wait for a slot and start fn on the LLM pool; the slot is freed when fn returns."""
+    loop = asyncio.get_running_loop()
+    semaphore = _get_semaphore()
+    await semaphore.acquire()
+
+    def release(_: "Future[Any]") -> None:
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # Event loop already closed; the semaphore went with it
+            pass
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(release)
+    return future
+
+
+async def _run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking SDK call on the LLM pool with the concurrency limit and timeout."""
+    future = await _submit(functools.partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.llm_timeout)
+
 
 def _get_client():
+    global _client
     if not settings.ark_api_key:
         return None
-    return Ark(
-        base_url=settings.ark_api_base,
-        api_key=settings.ark_api_key,
-    )
+    if _client is None:
+        # The SDK takes hundreds of ms to import; only pay that once a key is set and a call is made
+        from volcenginesdkarkruntime import Ark
 
-async def stream_reason(prompt: str, fallback: str) -> AsyncGenerator[str, None]:
-    """
-    流式生成推荐理由，支持返回思考过程（reasoning_content）和最终回答（content）。
-    Yields format: "TYPE:CONTENT"
-    - "THINK:xxx" -> 思考过程
-    - "TEXT:xxx" -> 最终回答片段
-    """
-    client = _get_client()
-    if not client:
-        yield f"TEXT:{fallback}"
-        return
+        _client = Ark(
+            base_url=settings.ark_api_base,
+            api_key=settings.ark_api_key,
+        )
+    return _client
+
+
+def _parse_stream_chunk(chunk: Any) -> List[str]:
+    """Convert one Ark stream chunk into "THINK:xxx" / "TEXT:xxx" parts."""
+    parts: List[str] = []
+    # Handle Ark SDK stream response structure
+    # 1. Reasoning content (Deep Thinking)
+    if hasattr(chunk, "output") and chunk.output:
+        for item in chunk.output:
+            # Reasoning phase
+            if hasattr(item, "type") and item.type == "reasoning":
+                 if hasattr(item, "summary") and item.summary:
+                     for sum_item in item.summary:
+                         if hasattr(sum_item, "text") and sum_item.text:
+                             parts.append(f"THINK:{sum_item.text}")
+
+            # Content phase
+            elif hasattr(item, "type") and item.type == "message":
+                if hasattr(item, "content") and item.content:
+                    for part in item.content:
+                        if hasattr(part, "text") and part.text:
+                            parts.append(f"TEXT:{part.text}")
+
+    # Fallback for other SDK versions or standard OpenAI format
+    elif hasattr(chunk, "choices") and chunk.choices:
+        delta = chunk.choices[0].delta
+
+        # Try to get reasoning content if available (standard OpenAI compatible)
+        if hasattr(delta, "reasoning_content") and delta.reasoning_content:
+             parts.append(f"THINK:{delta.reasoning_content}")
 
+        # Standard content
+        if hasattr(delta, "content") and delta.content:
+            parts.append(f"TEXT:{delta.content}")
+    return parts
+
+
+def _pump_stream(
+    client: Any,
+    prompt: str,
+    loop: asyncio.AbstractEventLoop,
+    queue: "asyncio.Queue[Any]",
+    stop: threading.Event,
+) -> None:
+    """Worker-thread side of stream_reason: iterate the blocking stream into an asyncio queue."""
+    def put(value: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, value)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening any more
+            stop.set()
+
+    stream = None
     try:
         # Enable streaming
         stream = client.responses.create(
@@ -39,41 +145,75 @@ async def stream_reason(prompt: str, fallback: str) -> AsyncGenerator[str, None]
             ],
             stream=True
         )
-        
         for chunk in stream:
-            # Handle Ark SDK stream response structure
-            # 1. Reasoning content (Deep Thinking)
-            if hasattr(chunk, "output") and chunk.output:
-                for item in chunk.output:
-                    # Reasoning phase
-                    if hasattr(item, "type") and item.type == "reasoning":
-                         if hasattr(item, "summary") and item.summary:
-                             for sum_item in item.summary:
-                                 if hasattr(sum_item, "text") and sum_item.text:
-                                     yield f"THINK:{sum_item.text}"
-                    
-                    # Content phase
-                    elif hasattr(item, "type") and item.type == "message":
-                        if hasattr(item, "content") and item.content:
-                            for part in item.content:
-                                if hasattr(part, "text") and part.text:
-                                    yield f"TEXT:{part.text}"
-            
-            # Fallback for other SDK versions or standard OpenAI format
-            elif hasattr(chunk, "choices") and chunk.choices:
-                delta = chunk.choices[0].delta
-                
-                # Try to get reasoning content if available (standard OpenAI compatible)
-                if hasattr(delta, "reasoning_content") and delta.reasoning_content:
-                     yield f"THINK:{delta.reasoning_content}"
-                
-                # Standard content
-                if hasattr(delta, "content") and delta.content:
-                    yield f"TEXT:{delta.content}"
-
+            if stop.is_set():
+                break
+            for part in _parse_stream_chunk(chunk):
+                put(part)
     except Exception as e:
-        print(f"[LLM Error] stream_reason failed: {e}")
+        put(e)
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+        put(_STREAM_END)
+
+
+async def stream_reason(prompt: str, fallback: str) -> AsyncGenerator[str, None]:
+    """
+    流式生成推荐理由，支持返回思考过程（reasoning_content）和最终回答（content）。
+    Yields format: "TYPE:CONTENT"
+    - "THINK:xxx" -> 思考过程
+    - "TEXT:xxx" -> 最终回答片段
+
+    The blocking SDK stream is consumed on the LLM pool and pumped through an
+    asyncio queue. LLM_TIMEOUT bounds the gap between chunks and
+    LLM_STREAM_TIMEOUT the whole stream. The pump holds an LLM slot only while
+    it reads from upstream; the queue is unbounded, so a slow consumer never
+    keeps a slot busy.
+    """
+    client = _get_client()
+    if not client:
         yield f"TEXT:{fallback}"
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    stop = threading.Event()
+    has_text = False
+    chunks = {"think": 0, "text": 0}
+    first_chunk: Optional[float] = None
+    started = time.perf_counter()
+    try:
+        await _submit(_pump_stream, client, prompt, loop, queue, stop)
+        deadline = loop.time() + settings.llm_stream_timeout
+        while True:
+            timeout = min(settings.llm_timeout, deadline - loop.time())
+            item = await asyncio.wait_for(queue.get(), timeout=max(timeout, 0))
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            is_text = item.startswith("TEXT:")
+            chunks["text" if is_text else "think"] += 1
+            has_text = has_text or is_text
+            yield item
+
+    except Exception as e:
+        print(f"[LLM Error] stream_reason failed: {e!r}")
+        if not has_text:
+            yield f"TEXT:{fallback}"
+    finally:
+        # Tell the worker to stop reading if we timed out or the client went away
+        stop.set()
+        elapsed = time.perf_counter() - started
+        observe("llm.stream", elapsed)
+        record_llm_stream(chunks, first_chunk, elapsed)
 
 async def generate_reason(prompt: str, fallback: str) -> str:
     client = _get_client()
@@ -81,22 +221,21 @@ async def generate_reason(prompt: str, fallback: str) -> str:
         return fallback
 
     try:
-        # Note: Ark client is synchronous by default, but we can use it in async context
-        # In a high-concurrency production env, consider running this in a thread pool
-        # or using an async-compatible client if available.
-        response = client.responses.create(
-            model=settings.ark_model,
-            input=[
-                {
-                    "role": "system", 
-                    "content": "你是推荐系统助手，请给出简洁推荐理由"
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                },
-            ],
-        )
+        with span("llm.generate"):
+            response = await _run_blocking(
+                client.responses.create,
+                model=settings.ark_model,
+                input=[
+                    {
+                        "role": "system", 
+                        "content": "你是推荐系统助手，请给出简洁推荐理由"
+                    },
+                    {
+                        "role": "user", 
+                        "content": prompt
+                    },
+                ],
+            )
         # Ark response structure handling
         # SDK 返回的是 Pydantic 模型，直接访问属性
         # 兼容不同版本的 SDK 返回格式
@@ -124,7 +263,7 @@ async def generate_reason(prompt: str, fallback: str) -> str:
         return content.strip() if content else fallback
             
     except Exception as e:
-        print(f"[LLM Error] generate_reason failed: {e}")
+        print(f"[LLM Error] generate_reason failed: {e!r}")
         return fallback
     return fallback
 
@@ -142,7 +281,8 @@ async def generate_reviews(count: int, product_type: str) -> List[Dict[str, str]
     )
 
     try:
-        response = client.responses.create(
+        response = await _run_blocking(
+            client.responses.create,
             model=settings.ark_model,
             input=[
                 {
@@ -202,6 +342,6 @@ async def generate_reviews(count: int, product_type: str) -> List[Dict[str, str]
         return []
             
     except Exception as e:
-        print(f"[LLM Error] generate_reviews failed: {e}")
+        print(f"[LLM Error] generate_reviews failed: {e!r}")
         return []
 
@@ -0,0 +1,277 @@
+import asyncio
+import gc
+import hmac
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.collapsed$")
+# Leaf added to samples where the request was suspended (DB, LLM queue, other tasks running)
+WAIT_FRAME = "<await>"
+
+
+def profile_dir() -> Path:
+    base = Path(settings.data_dir) if settings.data_dir else Path(__file__).resolve().parents[2] / "data"
+    return base / "profiles"
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _thread_stack(frame: Optional[FrameType]) -> List[FrameType]:
+    """Root-first frames of a thread or greenlet stack."""
+    stack = []
+    while frame is not None:
+        stack.append(frame)
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _frame_of(obj: Any) -> Optional[FrameType]:
+    return getattr(obj, "cr_frame", None) or getattr(obj, "gi_frame", None) or getattr(obj, "ag_frame", None)
+
+
+def _running_async_generator(frame: FrameType) -> Any:
+    # `async for` awaits an asend object that hides its generator; find the
+    # generator being iterated among what the frame references (locals and
+    # the value stack) and self's attributes
+    candidates = gc.get_referents(frame)
+    owner = frame.f_locals.get("self")
+    if hasattr(owner, "__dict__"):
+        candidates.extend(vars(owner).values())
+    for value in candidates:
+        if inspect.isasyncgen(value) and value.ag_running:
+            return value
+    return None
+
+
+def _coroutine_chain(task: asyncio.Task) -> List[FrameType]:
+    """Frames along the task's await chain, outermost first."""
+    frames = []
+    obj: Any = task.get_coro()
+    while obj is not None:
+        frame = _frame_of(obj)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaited = getattr(obj, "cr_await", None) or getattr(obj, "gi_yieldfrom", None) or getattr(obj, "ag_await", None)
+        if awaited is not None and _frame_of(awaited) is None:
+            awaited = _running_async_generator(frame) or awaited
+        obj = awaited
+    return frames
+
+
+class RequestProfile:
+    """
+    Wall-clock sampler for the tasks of one request.
+
+    A daemon thread wakes every interval and walks the await chain of each
+    task the request spawned. If the innermost frame is on the event loop
+    thread's stack the sample is CPU time and gets the synchronous callees;
+    otherwise it ends in WAIT_FRAME. SQLAlchemy's greenlet_spawn is expanded
+    into the suspended sync stack, so DB waits show which query was waiting.
+    """
+
+    def __init__(self, name: str, interval: float, max_seconds: float) -> None:
+        self.name = name
+        self.interval = interval
+        self.max_seconds = max_seconds
+        # Appended on the loop thread, copied by slicing on the sampler thread
+        self.tasks: List[asyncio.Task] = []
+        self.samples: "Counter[str]" = Counter()
+        self.sample_count = 0
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            try:
+                self._sample()
+            except Exception:
+                # Frames change under us; a torn sample is dropped, not fatal
+                continue
+
+    def _sample(self) -> None:
+        loop_stack = _thread_stack(sys._current_frames().get(self._thread_id))
+        on_loop = {id(frame): i for i, frame in enumerate(loop_stack)}
+        for task in self.tasks[:]:
+            if task.done():
+                continue
+            chain = _coroutine_chain(task)
+            if not chain:
+                continue
+            frames = [f"task:{task.get_name()}"]
+            running = False
+            for depth, frame in enumerate(chain):
+                frames.append(_label(frame))
+                if frame.f_code.co_name == "greenlet_spawn":
+                    context = frame.f_locals.get("context")
+                    suspended = getattr(context, "gr_frame", None)
+                    if suspended is not None:
+                        frames.extend(_label(f) for f in _thread_stack(suspended))
+                    elif depth == len(chain) - 1 and context is not None and not context.dead:
+                        # The greenlet is the code running on the loop thread right now
+                        frames.extend(_label(f) for f in loop_stack)
+                        running = True
+            innermost = on_loop.get(id(chain[-1]))
+            if innermost is not None:
+                frames.extend(_label(f) for f in loop_stack[innermost + 1:])
+                running = True
+            if not running:
+                frames.append(WAIT_FRAME)
+            self.samples[";".join(frames)] += 1
+        self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one `frame;frame;... count` line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("uni_rec_profile", default=None)
+
+
+def _recording_factory(previous):
+    """
+    Task factory that delegates to `previous` and records the new task on the
+    profile in the creating context. Only tasks spawned from the profiled
+    request's context (e.g. the SSE body) see _active set, so other requests'
+    tasks pass straight through.
+    """
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        profile = _active.get()
+        if profile is not None:
+            profile.tasks.append(task)
+        return task
+
+    return factory
+
+
+class ProfilerMiddleware:
+    """
+    Opt-in per-request profiling: send `X-Profile: 1` (or `?profile=1`) with
+    `X-Admin-Token`. Profiles are globally rate limited to one at a time and
+    one per PROFILER_MIN_INTERVAL seconds; the collapsed stacks are written
+    to the data directory and named in the X-Profile response header.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._busy = False
+        self._last_started = float("-inf")
+
+    def _requested(self, scope) -> Tuple[bool, str]:
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        flag = headers.get(PROFILE_HEADER) or (query.get("profile") or [""])[0]
+        return flag.lower() in ("1", "true", "yes"), headers.get(ADMIN_TOKEN_HEADER, "")
+
+    def _admit(self, token: str) -> str:
+        if not check_admin_token(token):
+            return "unauthorized"
+        now = time.monotonic()
+        if self._busy or now - self._last_started < settings.profiler_min_interval:
+            return "rate-limited"
+        self._busy = True
+        self._last_started = now
+        return ""
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.profiler_admin_token:
+            await self.app(scope, receive, send)
+            return
+        requested, token = self._requested(scope)
+        if not requested:
+            await self.app(scope, receive, send)
+            return
+
+        status = self._admit(token)
+        if status:
+            await self.app(scope, receive, self._with_header(send, "x-profile-status", status))
+            return
+
+        route = re.sub(r"[^\w]+", "_", scope["path"]).strip("_")
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{route}.collapsed"
+        profile = RequestProfile(name, settings.profiler_interval_ms / 1000.0, settings.profiler_max_seconds)
+        profile.tasks.append(asyncio.current_task())
+        # asyncio has no per-task spawn hook before 3.12, so the factory is
+        # swapped for the duration; _admit() keeps this to one profile at a time
+        loop = asyncio.get_running_loop()
+        previous = loop.get_task_factory()
+        factory = _recording_factory(previous)
+        loop.set_task_factory(factory)
+        token = _active.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, self._with_header(send, PROFILE_HEADER, name))
+        finally:
+            profile.stop()
+            _active.reset(token)
+            # If something installed its own factory meanwhile, keep it: ours
+            # still delegates to `previous` and records nothing once _active is reset
+            if loop.get_task_factory() is factory:
+                loop.set_task_factory(previous)
+            self._busy = False
+            self._save(profile)
+
+    @staticmethod
+    def _with_header(send, name: str, value: str):
+        async def send_with_header(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(name.encode(), value.encode())]
+            await send(message)
+
+        return send_with_header
+
+    @staticmethod
+    def _save(profile: RequestProfile) -> None:
+        path = profile_dir() / profile.name
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(profile.collapsed(), encoding="utf-8")
+        except OSError as e:
+            print(f"[Profiler] could not write {path}: {e}")
+            return
+        print(f"[Profiler] {profile.sample_count} samples written to {path}")
+
+
+def check_admin_token(token: str) -> bool:
+    return bool(settings.profiler_admin_token) and hmac.compare_digest(
+        token.encode(), settings.profiler_admin_token.encode()
+    )
+
+
+def read_profile(name: str) -> Optional[str]:
+    if not PROFILE_NAME_PATTERN.match(name):
+        return None
+    path = profile_dir() / name
+    return path.read_text(encoding="utf-8") if path.is_file() else None
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, AsyncIterable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def _dumps_json(obj: Any) -> bytes:
+    # Compact separators and raw UTF-8: Chinese text is 3 bytes a character instead of a 6-byte \u escape
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_orjson(obj: Any) -> bytes:
+    return orjson.dumps(obj)
+
+
+SERIALIZERS: Dict[str, Callable[[Any], bytes]] = {"json": _dumps_json}
+if orjson is not None:
+    SERIALIZERS["orjson"] = _dumps_orjson
+
+
+def get_serializer(name: str) -> Callable[[Any], bytes]:
+    """SSE_SERIALIZER: "auto" picks orjson when it is installed."""
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name not in SERIALIZERS:
+        print(f"[SSE] serializer {name!r} unavailable, using json")
+        name = "json"
+    return SERIALIZERS[name]
+
+
+dumps = get_serializer(settings.sse_serializer)
+
+DONE_FRAME = b"event: done\ndata: {}\n\n"
+
+
+def sse_frame(data: Any, event: Optional[str] = None) -> bytes:
+    body = b"data: " + dumps(data) + b"\n\n"
+    return b"event: " + event.encode("ascii") + b"\n" + body if event else body
+
+
+async def batch_chunks(
+    chunks: AsyncIterable[str], interval: float
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    Merge "TYPE:CONTENT" LLM chunks into (TYPE, CONTENT) frames.
+
+    Consecutive chunks of the same type are joined until `interval` seconds
+    have passed since the first one, so a burst of tiny tokens becomes a
+    single frame. A pending frame is flushed on time even if the upstream
+    stalls; the upstream is never cancelled mid-chunk.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    kind: Optional[str] = None
+    buffer = []
+    deadline = 0.0
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - loop.time(), 0.0) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield kind, "".join(buffer)
+                buffer = []
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+            chunk_kind, _, content = chunk.partition(":")
+            if buffer and chunk_kind != kind:
+                yield kind, "".join(buffer)
+                buffer = []
+            if not buffer:
+                kind = chunk_kind
+                deadline = loop.time() + interval
+            buffer.append(content)
+        if buffer:
+            yield kind, "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,219 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Seconds; spans range from in-memory lookups to full LLM streams
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is one bisect and three additions."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        # The last slot is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Registry:
+    """Named metric families rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        # name -> (type, help, buckets, {labels: metric})
+        self._families: Dict[str, Tuple[str, str, Sequence[float], Dict[Labels, Any]]] = {}
+
+    def _metric(self, kind: str, name: str, help: str, labels: Labels, factory: Callable[[], Any], buckets=()) -> Any:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help, buckets, {})
+        metrics = family[3]
+        metric = metrics.get(labels)
+        if metric is None:
+            metric = metrics[labels] = factory()
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Labels = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metric("histogram", name, help, labels, lambda: Histogram(buckets), buckets)
+
+    def counter(self, name: str, help: str, labels: Labels = ()) -> Counter:
+        return self._metric("counter", name, help, labels, Counter)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (kind, help, _, metrics) in sorted(self._families.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in sorted(metrics.items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric.value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), metric.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+registry = Registry()
+
+# Histograms looked up once per stage name rather than per observation
+_stage_histograms: Dict[str, Histogram] = {}
+_db_queries = registry.counter("uni_rec_db_queries_total", "SQL statements executed")
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a duration measured by hand (e.g. across generator yields)."""
+    if not settings.tracing_enabled:
+        return
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms[stage] = registry.histogram(
+            "uni_rec_stage_seconds", "Time spent per processing stage", (("stage", stage),)
+        )
+    histogram.observe(seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the block into the uni_rec_stage_seconds histogram of `stage`."""
+    if not settings.tracing_enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+# --- Per-request accounting ----------------------------------------------------
+
+class RequestTrace:
+    __slots__ = ("db_queries",)
+
+    def __init__(self) -> None:
+        self.db_queries = 0
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("uni_rec_request_trace", default=None)
+
+
+def count_query() -> None:
+    """Called for every SQL statement (a before_cursor_execute listener in data_store)."""
+    _db_queries.inc()
+    trace = _current.get()
+    if trace is not None:
+        trace.db_queries += 1
+
+
+def record_llm_stream(chunks: Dict[str, int], first_chunk_seconds: Optional[float], stream_seconds: float) -> None:
+    """Token counters and throughput of one LLM stream; chunks are roughly tokens."""
+    if not settings.tracing_enabled:
+        return
+    for kind, count in chunks.items():
+        registry.counter("uni_rec_llm_tokens_total", "LLM stream chunks received", (("kind", kind),)).inc(count)
+    total = sum(chunks.values())
+    if first_chunk_seconds is not None:
+        observe("llm.first_token", first_chunk_seconds)
+        generating = stream_seconds - first_chunk_seconds
+        if total > 1 and generating > 0:
+            # Rate after the first chunk, so time-to-first-token does not dilute it
+            registry.histogram(
+                "uni_rec_llm_tokens_per_second", "LLM streaming throughput", buckets=TOKEN_RATE_BUCKETS
+            ).observe((total - 1) / generating)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: request latency and SQL statement count per route.
+
+    Timing covers the whole response, so a streamed /recommend is measured
+    until its last SSE frame. Routes are labelled with their path template.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._route_paths: Optional[Dict[Any, str]] = None
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        trace = RequestTrace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = (("route", self._route(scope)),)
+            registry.counter(
+                "uni_rec_requests_total", "HTTP requests", route + (("status", str(status)),)
+            ).inc()
+            registry.histogram("uni_rec_request_seconds", "HTTP request latency", route).observe(elapsed)
+            registry.histogram(
+                "uni_rec_request_db_queries", "SQL statements per HTTP request", route, QUERY_COUNT_BUCKETS
+            ).observe(trace.db_queries)
@@ -1,21 +1,57 @@
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-# Load .env file
-load_dotenv()
-
+from app.core.config import settings
+from app.core.profiler import ProfilerMiddleware
+from app.core.tracing import TracingMiddleware
 from app.routes.api import router as api_router
+from app.services.data_store import dispose_engines
+from app.services.feedback_buffer import feedback_buffer
+from app.services.impressions import impression_logger
+from app.services.metrics import metrics_aggregator
+from app.services.social_graph import social_graph
+from app.services.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background writers start with the worker and drain before it exits
+    feedback_buffer.start()
+    impression_logger.start()
+    # Edge changes are picked up in the background, not on the request path
+    social_graph.start()
+    metrics_aggregator.start()
+    # Pools and in-memory indexes are built before the first request; /api/ready reports the outcome
+    await warmup.start(settings.warmup_timeout)
+    yield
+    await warmup.stop()
+    await social_graph.stop()
+    await metrics_aggregator.stop()
+    await feedback_buffer.stop()
+    await impression_logger.stop()
+    if metrics_aggregator.bootstrapped:
+        metrics_aggregator.checkpoint()
+    await dispose_engines()
+
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="uni-rec")
+    app = FastAPI(title="uni-rec", lifespan=lifespan)
+    if settings.profiler_admin_token:
+        # Added first, so it is the innermost middleware and samples cover the route only
+        app.add_middleware(ProfilerMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # The frontend runs on another origin and pages /api/users with this header
+        expose_headers=["X-Next-Cursor"],
     )
+    if settings.tracing_enabled:
+        app.add_middleware(TracingMiddleware)
 
     app.include_router(api_router, prefix="/api")
     return app
@@ -26,6 +26,13 @@ class RecommendRequest(BaseModel):
     use_llm: bool = True
 
 
+class BatchRecommendRequest(BaseModel):
+    reviewerIDs: List[str]
+    top_k: int = 10
+    threshold: int = 5
+    mode: str = "auto"
+
+
 class RecommendedItem(BaseModel):
     asin: str
     score: float
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from sqlalchemy import String, Float, Integer, Boolean, Text, ForeignKey, JSON
+from sqlalchemy import String, Float, Integer, Boolean, Text, ForeignKey, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 
 class Base(DeclarativeBase):
@@ -33,6 +33,13 @@ class Item(Base):
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Per-user history ordered by time (startup type, sequence, history lookups)
+        Index("ix_reviews_reviewer_time", "reviewerID", "unixReviewTime"),
+        Index("ix_reviews_asin", "asin"),
+        # Feedback counting filters on summary IN (...); TEXT needs a prefix on MySQL
+        Index("ix_reviews_summary", "summary", mysql_length=32),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     reviewerID: Mapped[str] = mapped_column(ForeignKey("users.reviewerID"))
@@ -52,9 +59,41 @@ class Review(Base):
 
 class SocialEdge(Base):
     __tablename__ = "social_edges"
+    __table_args__ = (
+        Index("ix_social_edges_source", "source"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     source: Mapped[str] = mapped_column(ForeignKey("users.reviewerID"))
     target: Mapped[str] = mapped_column(ForeignKey("users.reviewerID"))
     weight: Mapped[float] = mapped_column(Float, default=0.0)
     type: Mapped[Optional[str]] = mapped_column(String(20))
+
+class Impression(Base):
+    __tablename__ = "impressions"
+    __table_args__ = (
+        Index("ix_impressions_reviewer_time", "reviewerID", "timestamp"),
+    )
+
+    # Append-only serving log: no foreign keys so batched inserts stay cheap
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    reviewerID: Mapped[str] = mapped_column(String(50))
+    asin: Mapped[str] = mapped_column(String(50))
+    rank: Mapped[int] = mapped_column(Integer)
+    module: Mapped[str] = mapped_column(String(20))
+    score: Mapped[float] = mapped_column(Float, default=0.0)
+    timestamp: Mapped[int] = mapped_column(Integer)
+
+class PrecomputedRec(Base):
+    __tablename__ = "precomputed_recs"
+
+    # Offline top-K per user, written by scripts/precompute_recs.py
+    reviewerID: Mapped[str] = mapped_column(String(50), primary_key=True)
+    module: Mapped[str] = mapped_column(String(20))
+    startup_type: Mapped[str] = mapped_column(String(10))
+    behavior_count: Mapped[int] = mapped_column(Integer)
+    threshold: Mapped[int] = mapped_column(Integer)
+    # [{"asin", "score", "source", "reason"}]; item meta is joined from the index at serve time
+    items: Mapped[List[dict]] = mapped_column(JSON)
+    # Batch start time; activity at or after it means the row is stale for that user
+    version: Mapped[int] = mapped_column(Integer)
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.config import settings
+from app.core.profiler import check_admin_token, read_profile
+from app.core.tracing import registry
 from app.models.schemas import (
+    BatchRecommendRequest,
     DataGenerateRequest,
     DataSnapshotResponse,
     FeedbackRequest,
@@ -16,10 +23,18 @@ from app.models.schemas import (
     UserProfileResponse,
 )
 from app.models.sql_models import User, Item, Review, SocialEdge
-from app.services.data_store import get_db
+from app.services.batch_recommend import MAX_BATCH_USERS, stream_batch
+from app.services.data_store import get_db, get_read_db, ping_all, pool_stats, read_session_factory
 from app.services.feedback import add_feedback
+from app.services.feedback_buffer import feedback_buffer
 from app.services.metrics import compute_metrics
+from app.services.precomputed import precomputed_recs
+from app.services.reason_cache import reason_cache
+from app.services.rec_cache import recommendation_cache
+from app.services.user_context import user_contexts
+from app.services.users import DEFAULT_PAGE_SIZE, list_users, stream_users
 from app.services.recommendation import get_sequence_events, get_social_graph, get_startup_type, recommend_stream
+from app.services.warmup import warmup
 
 
 router = APIRouter()
@@ -27,9 +42,26 @@ router = APIRouter()
 
 @router.get("/health")
 def health() -> dict:
+    """Liveness: the process answers; says nothing about the database."""
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness: warmed up, feedback writer running and every database answering."""
+    body = {"status": "ready", "warmup": warmup.status(), "feedback_writer": feedback_buffer.running}
+    if not warmup.ready:
+        body["status"] = "warming"
+    elif not feedback_buffer.running:
+        body["status"] = "unavailable"
+    else:
+        try:
+            await ping_all(settings.ready_check_timeout)
+        except Exception as e:
+            body.update(status="unavailable", error=repr(e))
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+
 @router.post("/data/generate")
 async def generate_snapshot(payload: DataGenerateRequest):
     # This endpoint was for in-memory generation.
@@ -39,34 +71,45 @@ async def generate_snapshot(payload: DataGenerateRequest):
 
 
 @router.get("/users")
-async def get_users_list(session: AsyncSession = Depends(get_db)) -> list[dict]:
-    """Return a list of all users with basic info."""
-    result = await session.execute(select(User))
-    users = result.scalars().all()
-    return [
-        {
-            "reviewerID": u.reviewerID,
-            "reviewerName": u.reviewerName or "",
-            "meta": u.meta or {},
-        }
-        for u in users
-    ]
+async def get_users_list(
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_db),
+) -> list[dict]:
+    """
+    One page of users ordered by reviewerID, optionally filtered by an ID prefix.
+
+    The body stays a plain list; pass the X-Next-Cursor header back as
+    `cursor` for the next page (absent on the last page).
+    """
+    users, next_cursor = await list_users(session, limit=limit, cursor=cursor, prefix=prefix)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
+
+
+@router.get("/users/stream")
+async def stream_users_list(prefix: Optional[str] = None):
+    """Every user (matching the prefix) as NDJSON, read through a server-side cursor."""
+    return StreamingResponse(stream_users(read_session_factory, prefix), media_type="application/x-ndjson")
 
 
 @router.get("/users/{user_id}", response_model=UserProfileResponse)
-async def get_user_profile(user_id: str, session: AsyncSession = Depends(get_db)) -> UserProfileResponse:
-    user = await session.get(User, user_id)
-    if not user:
+async def get_user_profile(user_id: str, session: AsyncSession = Depends(get_read_db)) -> UserProfileResponse:
+    ctx = await user_contexts.get(session, user_id)
+    if not ctx.exists:
         raise HTTPException(status_code=404, detail="user not found")
     return UserProfileResponse(
         reviewerID=user_id,
-        reviewerName=user.reviewerName or "",
-        meta=user.meta or {},
+        reviewerName=ctx.profile["reviewerName"],
+        meta=ctx.profile["meta"],
     )
 
 
 @router.get("/users/{user_id}/startup-type", response_model=StartupTypeResponse)
-async def startup_type(user_id: str, threshold: int = 5, session: AsyncSession = Depends(get_db)) -> StartupTypeResponse:
+async def startup_type(user_id: str, threshold: int = 5, session: AsyncSession = Depends(get_read_db)) -> StartupTypeResponse:
     startup, count = await get_startup_type(session, user_id, threshold)
     return StartupTypeResponse(
         reviewerID=user_id, startup_type=startup, behavior_count=count, threshold=threshold
@@ -74,43 +117,102 @@ async def startup_type(user_id: str, threshold: int = 5, session: AsyncSession =
 
 
 @router.get("/users/{user_id}/sequence", response_model=SequenceResponse)
-async def sequence_events(user_id: str, session: AsyncSession = Depends(get_db)) -> SequenceResponse:
+async def sequence_events(user_id: str, session: AsyncSession = Depends(get_read_db)) -> SequenceResponse:
     events = await get_sequence_events(session, user_id)
     return SequenceResponse(events=events)
 
 
 @router.get("/users/{user_id}/social-graph", response_model=SocialGraphResponse)
-async def social_graph(user_id: str, session: AsyncSession = Depends(get_db)) -> SocialGraphResponse:
+async def social_graph(user_id: str, session: AsyncSession = Depends(get_read_db)) -> SocialGraphResponse:
     data = await get_social_graph(session, user_id)
     return SocialGraphResponse(nodes=data["nodes"], edges=data["edges"])
 
 
 @router.post("/recommend")
-async def recommend_items(payload: RecommendRequest, session: AsyncSession = Depends(get_db)):
-    # Verify user exists
-    user = await session.get(User, payload.reviewerID)
-    if not user:
+async def recommend_items(payload: RecommendRequest, session: AsyncSession = Depends(get_read_db)):
+    # Verify user exists; the loaded context is reused by the whole recommendation path
+    ctx = await user_contexts.get(session, payload.reviewerID)
+    if not ctx.exists:
         raise HTTPException(status_code=404, detail="user not found")
         
+    async def stream():
+        # The dependency session is closed before the body streams; the stream
+        # owns its own session so its connection goes back to the pool
+        async with read_session_factory() as stream_session:
+            async for event in recommend_stream(
+                session=stream_session,
+                reviewer_id=payload.reviewerID,
+                top_k=payload.top_k,
+                threshold=payload.threshold,
+                mode=payload.mode,
+                use_llm=payload.use_llm,
+            ):
+                yield event
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@router.post("/recommend/batch")
+async def recommend_batch(payload: BatchRecommendRequest):
+    """Recommendations for many users as NDJSON, without LLM reasons."""
+    if len(payload.reviewerIDs) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_USERS} reviewerIDs per batch")
     return StreamingResponse(
-        recommend_stream(
-            session=session,
-            reviewer_id=payload.reviewerID,
+        stream_batch(
+            read_session_factory,
+            payload.reviewerIDs,
             top_k=payload.top_k,
             threshold=payload.threshold,
             mode=payload.mode,
-            use_llm=payload.use_llm,
         ),
-        media_type="text/event-stream"
+        media_type="application/x-ndjson",
     )
 
 
 @router.post("/feedback")
 async def feedback(payload: FeedbackRequest, session: AsyncSession = Depends(get_db)) -> dict:
-    record = await add_feedback(session, payload.reviewerID, payload.asin, payload.score)
+    try:
+        record = await add_feedback(session, payload.reviewerID, payload.asin, payload.score)
+    except SQLAlchemyError:
+        # Only reached when writing through (buffer full or no flusher): tell clients to back off
+        raise HTTPException(status_code=503, detail="feedback store unavailable")
     return {"ok": True, "record": record}
 
 
 @router.get("/metrics", response_model=MetricsResponse)
-async def metrics(session: AsyncSession = Depends(get_db)) -> MetricsResponse:
+async def metrics(session: AsyncSession = Depends(get_read_db)) -> MetricsResponse:
     return MetricsResponse(metrics=await compute_metrics(session))
+
+
+@router.get("/metrics/prometheus")
+def metrics_prometheus() -> Response:
+    """Stage latency histograms, per-request SQL counts and LLM throughput in the Prometheus text format."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/cache/stats")
+def cache_stats() -> dict:
+    """Hit/miss counters of the in-memory caches, for sizing them."""
+    return {
+        "recommendations": recommendation_cache.stats(),
+        "precomputed": precomputed_recs.stats(),
+        "reasons": reason_cache.stats(),
+        "user_contexts": user_contexts.stats(),
+    }
+
+
+@router.get("/db/stats")
+def db_stats() -> dict:
+    """Connection pool usage and checkout wait times of the primary and replicas."""
+    return pool_stats()
+
+
+@router.get("/profiles/{name}")
+def get_profile(name: str, x_admin_token: str = Header("")) -> Response:
+    """A collapsed-stack profile recorded by the profiler middleware (flamegraph.pl / speedscope input)."""
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    content = read_profile(name)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=content, media_type="text/plain; charset=utf-8")
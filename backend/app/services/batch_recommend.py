@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, Dict, List, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import Review, User
+from app.services.feedback_buffer import feedback_buffer
+from app.services.item_embeddings import item_embeddings
+from app.services.item_index import item_index
+from app.services.item_neighbors import item_neighbors
+from app.services.recommendation import (
+    SOCIAL_NEIGHBOR_LIMIT,
+    SOCIAL_REVIEWS_PER_NEIGHBOR,
+    content_items,
+    itemcf_items,
+    sequence_items,
+    social_items,
+)
+from app.services.scoring import fetch_recent_histories, fetch_recent_reviews, sequence_scorer
+from app.services.social_graph import social_graph
+
+# Users scored together (one count query, one history query, one scoring call)
+BATCH_CHUNK_SIZE = 200
+# Chunks in flight at once, each on its own session
+BATCH_CONCURRENCY = 4
+MAX_BATCH_USERS = 100_000
+# Neighbor ids per recent-reviews query for the chunk's social users
+NEIGHBOR_QUERY_SIZE = 500
+
+
+async def recommend_users(
+    session: AsyncSession, reviewer_ids: Sequence[str], top_k: int, threshold: int, mode: str
+) -> List[Dict[str, Any]]:
+    """
+    Recommendations for a chunk of users without LLM reasons.
+
+    Same module choice as compute_recommendations, but the behavior counts
+    and histories of the whole chunk come from one grouped query each, and
+    all sequence users are ranked in a single score_batch call (content users
+    in a single recommend_batch call). Social users run their propagation in
+    memory and share the neighbor-review queries of the union of their
+    neighbors (NEIGHBOR_QUERY_SIZE ids each).
+    """
+    index = await item_index.ensure(session)
+    result = await session.execute(select(User.reviewerID).where(User.reviewerID.in_(list(reviewer_ids))))
+    known = {row[0] for row in result}
+    result = await session.execute(
+        select(Review.reviewerID, func.count())
+        .where(Review.reviewerID.in_(list(known)))
+        .group_by(Review.reviewerID)
+    )
+    counts = dict(result.all())
+
+    modules: Dict[str, str] = {}
+    startup_types: Dict[str, str] = {}
+    for rid in known:
+        counts[rid] = counts.get(rid, 0) + feedback_buffer.pending_count(rid)
+        startup_types[rid] = "cold" if counts[rid] < threshold else "hot"
+        module = "sequence" if startup_types[rid] == "hot" else "social"
+        modules[rid] = mode if mode in ["sequence", "social", "itemcf", "content"] else module
+
+    items: Dict[str, List[Dict[str, Any]]] = {}
+    social_users = [rid for rid in known if modules[rid] == "social"]
+    graph = await social_graph.ensure(session) if social_users else None
+    neighbors = {rid: dict(graph.top_users(rid, SOCIAL_NEIGHBOR_LIMIT)) for rid in social_users}
+    # Social users without neighbors fall back to sequence, as online
+    history_users = [rid for rid in known if modules[rid] in ("sequence", "itemcf", "content")]
+    history_users += [rid for rid in social_users if not neighbors[rid]]
+    histories = await fetch_recent_histories(session, history_users)
+    histories = {rid: feedback_buffer.merge_history(rid, recent) for rid, recent in histories.items()}
+
+    table = await item_neighbors.ensure() if any(modules[rid] == "itemcf" for rid in history_users) else None
+    if table is not None:
+        for rid in history_users:
+            if modules[rid] == "itemcf":
+                items[rid] = itemcf_items(index, table, histories[rid], top_k)
+
+    content_users = [rid for rid in history_users if modules[rid] == "content"]
+    embeddings = await item_embeddings.ensure() if content_users else None
+    if embeddings is not None:
+        # One scan of the vector matrix for the chunk, off the event loop
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            None, embeddings.recommend_batch, [histories[rid] for rid in content_users], top_k * 2
+        )
+        for rid, ranked_items in zip(content_users, ranked):
+            items[rid] = content_items(index, ranked_items, top_k)
+
+    # itemcf / content users without hits (or without an offline build) fall back to sequence, as online
+    sequence_users = [rid for rid in history_users if not items.get(rid)]
+    ranked = sequence_scorer.score_batch([histories[rid] for rid in sequence_users], top_k)
+    for rid, ranked_items in zip(sequence_users, ranked):
+        items[rid] = sequence_items(index, ranked_items)
+
+    neighbor_ids = list({nid for rid in social_users for nid in neighbors[rid]})
+    neighbor_reviews: Dict[str, List[Tuple[str, float]]] = {}
+    for i in range(0, len(neighbor_ids), NEIGHBOR_QUERY_SIZE):
+        neighbor_reviews.update(
+            await fetch_recent_reviews(session, neighbor_ids[i : i + NEIGHBOR_QUERY_SIZE], SOCIAL_REVIEWS_PER_NEIGHBOR)
+        )
+    for rid in social_users:
+        if neighbors[rid]:
+            items[rid] = social_items(index, neighbors[rid], neighbor_reviews, top_k)
+
+    results = []
+    for rid in reviewer_ids:
+        if rid not in known:
+            results.append({"reviewerID": rid, "error": "user not found"})
+            continue
+        results.append(
+            {
+                "reviewerID": rid,
+                "startup_type": startup_types[rid],
+                "behavior_count": counts[rid],
+                "module": modules[rid],
+                "items": items[rid],
+            }
+        )
+    return results
+
+
+async def stream_batch(
+    session_factory,
+    reviewer_ids: Sequence[str],
+    top_k: int,
+    threshold: int,
+    mode: str,
+) -> AsyncGenerator[str, None]:
+    """
+    NDJSON lines, one per user in completion order, then a summary line.
+
+    At most BATCH_CONCURRENCY chunks run at once; the output queue is bounded
+    too, so a slow client holds back the workers instead of buffering results.
+    """
+    start = time.perf_counter()
+    # Dedupe, keep request order
+    reviewer_ids = list(dict.fromkeys(reviewer_ids))
+    chunks = [reviewer_ids[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(reviewer_ids), BATCH_CHUNK_SIZE)]
+    queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_chunk(chunk: List[str]) -> None:
+        async with semaphore:
+            try:
+                async with session_factory() as session:
+                    results = await recommend_users(session, chunk, top_k, threshold, mode)
+            except Exception as e:
+                print(f"[Batch] chunk of {len(chunk)} users failed: {e!r}")
+                results = [{"reviewerID": rid, "error": "recommendation failed"} for rid in chunk]
+            await queue.put(results)
+
+    tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in chunks]
+    served = failed = 0
+    try:
+        for _ in chunks:
+            for result in await queue.get():
+                if "error" in result:
+                    failed += 1
+                else:
+                    served += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+    finally:
+        # Client went away: stop the remaining chunks
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "done": True,
+        "users": served,
+        "failed": failed,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "users_per_second": round(served / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    yield json.dumps(summary) + "\n"
@@ -1,9 +1,57 @@
 import asyncio
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from app.core.llm import generate_reviews
 
+CATEGORY_PATHS = [
+    ["Electronics", "Computers & Accessories", "Laptops"],
+    ["Electronics", "Computers & Accessories", "Storage"],
+    ["Electronics", "Audio", "Headphones"],
+    ["Electronics", "Audio", "Speakers"],
+    ["Electronics", "Camera & Photo", "Action Cameras"],
+    ["Electronics", "Smart Home", "Smart Speakers"],
+    ["Electronics", "Gaming", "Controllers"],
+    ["Electronics", "Networking", "Routers"],
+    ["Electronics", "Office Electronics", "Monitors"],
+    ["Electronics", "Cell Phones", "Smartphones"],
+]
+FEATURE_POOL = [
+    "Bluetooth",
+    "Wi-Fi",
+    "USB-C",
+    "Fast Charging",
+    "Noise Cancelling",
+    "4K",
+    "Lightweight",
+    "Low Latency",
+    "Long Battery Life",
+    "Portable",
+]
+PRODUCT_TYPES = [
+    "Laptop",
+    "Smartphone",
+    "Bluetooth Headphones",
+    "Smart Speaker",
+    "Router",
+    "Monitor",
+    "Mechanical Keyboard",
+    "Wireless Mouse",
+    "Game Controller",
+    "Action Camera",
+    "Smart Watch",
+    "External SSD",
+]
+FALLBACK_REVIEW_TEMPLATES = [
+    {"reviewText": "性价比很高。", "summary": "不错的选择"},
+    {"reviewText": "质量可以更好。", "summary": "一般"},
+    {"reviewText": "非常喜欢！", "summary": "优秀"},
+    {"reviewText": "不如预期。", "summary": "失望"},
+    {"reviewText": "如宣传所言。", "summary": "靠谱的产品"},
+]
+
 async def generate_data(
     users: int = 30,
     items: int = 80,
@@ -37,52 +85,11 @@ async def generate_data(
         print(f"[DataGen] LLM review generation failed: {e}")
         
     if not review_templates:
-        review_templates = [
-            {"reviewText": "性价比很高。", "summary": "不错的选择"},
-            {"reviewText": "质量可以更好。", "summary": "一般"},
-            {"reviewText": "非常喜欢！", "summary": "优秀"},
-            {"reviewText": "不如预期。", "summary": "失望"},
-            {"reviewText": "如宣传所言。", "summary": "靠谱的产品"},
-        ]
+        review_templates = list(FALLBACK_REVIEW_TEMPLATES)
 
-    category_paths = [
-        ["Electronics", "Computers & Accessories", "Laptops"],
-        ["Electronics", "Computers & Accessories", "Storage"],
-        ["Electronics", "Audio", "Headphones"],
-        ["Electronics", "Audio", "Speakers"],
-        ["Electronics", "Camera & Photo", "Action Cameras"],
-        ["Electronics", "Smart Home", "Smart Speakers"],
-        ["Electronics", "Gaming", "Controllers"],
-        ["Electronics", "Networking", "Routers"],
-        ["Electronics", "Office Electronics", "Monitors"],
-        ["Electronics", "Cell Phones", "Smartphones"],
-    ]
-    feature_pool = [
-        "Bluetooth",
-        "Wi-Fi",
-        "USB-C",
-        "Fast Charging",
-        "Noise Cancelling",
-        "4K",
-        "Lightweight",
-        "Low Latency",
-        "Long Battery Life",
-        "Portable",
-    ]
-    product_types = [
-        "Laptop",
-        "Smartphone",
-        "Bluetooth Headphones",
-        "Smart Speaker",
-        "Router",
-        "Monitor",
-        "Mechanical Keyboard",
-        "Wireless Mouse",
-        "Game Controller",
-        "Action Camera",
-        "Smart Watch",
-        "External SSD",
-    ]
+    category_paths = CATEGORY_PATHS
+    feature_pool = FEATURE_POOL
+    product_types = PRODUCT_TYPES
     users_map: Dict[str, Any] = {}
     items_map: Dict[str, Any] = {}
     reviews: List[Dict[str, Any]] = []
@@ -165,13 +172,15 @@ async def generate_data(
             )
 
     user_list = list(users_map.keys())
-    for reviewer_id in user_list:
-        # Avoid self-loops and duplicate edges
-        potential_targets = [u for u in user_list if u != reviewer_id]
-        if not potential_targets:
+    for self_idx, reviewer_id in enumerate(user_list):
+        # Avoid self-loops and duplicate edges: sample positions among the other
+        # n-1 users and skip over our own slot (no per-user O(U) list rebuild)
+        n_targets = len(user_list) - 1
+        if n_targets <= 0:
             continue
-            
-        targets = random.sample(potential_targets, k=min(social_degree, len(potential_targets)))
+
+        picks = random.sample(range(n_targets), k=min(social_degree, n_targets))
+        targets = [user_list[i if i < self_idx else i + 1] for i in picks]
         for target in targets:
             social_edges.append(
                 {
@@ -190,3 +199,265 @@ async def generate_data(
         "feedback": [],
         "last_recommendations": [],
     }
+
+
+# Resampling rounds for duplicate draws before the uniform top-up
+UNIQUE_SAMPLE_ROUNDS = 8
+
+
+def _zipf_cdf(n: int, exponent: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Power-law popularity over n entities: (cdf over ranks, rank -> entity index)."""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    return cdf, rng.permutation(n)
+
+
+def _sample_zipf(cdf: np.ndarray, order: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    ranks = np.searchsorted(cdf, rng.random(size), side="right")
+    return order[np.minimum(ranks, len(order) - 1)]
+
+
+def _sample_zipf_unique(
+    cdf: np.ndarray,
+    order: np.ndarray,
+    counts: np.ndarray,
+    rng: np.random.Generator,
+    exclude: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Zipf samples without repeats within each owner (and never exclude[owner]).
+
+    Duplicates are dropped with np.unique on (owner, entity) keys and the
+    shortfall resampled; the few owners still short after UNIQUE_SAMPLE_ROUNDS
+    (counts close to the population) are topped up uniformly from the
+    entities they lack. Returns (counts, samples), samples grouped by owner in
+    random order within each owner; counts are capped at what is attainable.
+    """
+    n = len(order)
+    counts = np.clip(counts, 0, n - (exclude is not None))
+    owners = np.repeat(np.arange(len(counts)), counts)
+    picks = _sample_zipf(cdf, order, len(owners), rng)
+    for round_ in range(UNIQUE_SAMPLE_ROUNDS + 1):
+        valid = picks != exclude[owners] if exclude is not None else np.ones(len(picks), dtype=bool)
+        keys = np.unique(owners[valid] * n + picks[valid])
+        owners, picks = keys // n, keys % n
+        deficit = counts - np.bincount(owners, minlength=len(counts))
+        if not deficit.any():
+            break
+        if round_ < UNIQUE_SAMPLE_ROUNDS:
+            extra = np.repeat(np.arange(len(counts)), deficit)
+            owners = np.concatenate([owners, extra])
+            picks = np.concatenate([picks, _sample_zipf(cdf, order, len(extra), rng)])
+            continue
+        fill_owners, fill_picks = [owners], [picks]
+        for owner in np.nonzero(deficit)[0]:
+            taken = picks[owners == owner]
+            if exclude is not None:
+                taken = np.append(taken, exclude[owner])
+            missing = np.setdiff1d(np.arange(n), taken)
+            fill_owners.append(np.full(deficit[owner], owner))
+            fill_picks.append(rng.choice(missing, deficit[owner], replace=False))
+        owners, picks = np.concatenate(fill_owners), np.concatenate(fill_picks)
+    # np.unique sorted each owner's picks; shuffle them back into a random order
+    shuffle = rng.permutation(len(picks))
+    grouped = shuffle[np.argsort(owners[shuffle], kind="stable")]
+    return counts, picks[grouped]
+
+
+def _power_law_degrees(size: int, mean: float, cap: int, rng: np.random.Generator) -> np.ndarray:
+    """Heavy-tailed counts (Pareto, shape 2) rescaled to roughly the requested mean."""
+    raw = rng.pareto(2.0, size) + 1.0  # mean 2
+    return np.clip(np.rint(raw * mean / 2.0), 1, max(cap, 1)).astype(np.int64)
+
+
+# Entities per RNG stream in generate_data_chunks. Fixed, unlike chunk_size, so
+# the generated rows depend only on the seed, not on how they are batched.
+GENERATION_BLOCK = 4096
+# Independent RNG streams per table, keyed together with the block index
+_POPULARITY_STREAM, _ITEM_STREAM, _REVIEW_STREAM, _EDGE_STREAM = range(4)
+
+
+def _block_rng(seed: int, stream: int, block: int) -> np.random.Generator:
+    """RNG for one block of entities, derived from (seed, stream, block) alone."""
+    return np.random.default_rng(np.random.SeedSequence([seed, stream, block]))
+
+
+def _rechunk(table: str, blocks: Iterator[List[Dict[str, Any]]], chunk_size: int) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Re-batch per-block rows into (table, rows) chunks of chunk_size."""
+    rows: List[Dict[str, Any]] = []
+    for block in blocks:
+        rows.extend(block)
+        start = 0
+        while len(rows) - start >= chunk_size:
+            yield table, rows[start : start + chunk_size]
+            start += chunk_size
+        rows = rows[start:]
+    if rows:
+        yield table, rows
+
+
+def _item_blocks(
+    item_ids: np.ndarray, item_cdf: np.ndarray, item_order: np.ndarray, seed: int
+) -> Iterator[List[Dict[str, Any]]]:
+    features = np.array(FEATURE_POOL)
+    items = len(item_ids)
+    for block, start in enumerate(range(0, items, GENERATION_BLOCK)):
+        rng = _block_rng(seed, _ITEM_STREAM, block)
+        n = min(start + GENERATION_BLOCK, items) - start
+        cats = rng.integers(0, len(CATEGORY_PATHS), n)
+        brands = rng.integers(1, 81, n)
+        products = rng.integers(0, len(PRODUCT_TYPES), n)
+        models = rng.integers(100, 1000, n)
+        series = rng.choice(np.array(["X", "M", "S", "Z"]), n)
+        prices = np.round(np.clip(rng.lognormal(5.5, 1.0, n), 19, 4999), 2)
+        # 4 distinct features per item: argsort of random keys is a vectorized shuffle
+        feature_idx = np.argsort(rng.random((n, len(FEATURE_POOL))), axis=1)[:, :4]
+        # Distinct related items per item, never the item itself
+        own = np.arange(start, start + n)
+        buy_counts, also_buy = _sample_zipf_unique(item_cdf, item_order, np.full(n, 3), rng, own)
+        view_counts, also_viewed = _sample_zipf_unique(item_cdf, item_order, np.full(n, 5), rng, own)
+        also_buy = np.split(also_buy, np.cumsum(buy_counts)[:-1])
+        also_viewed = np.split(also_viewed, np.cumsum(view_counts)[:-1])
+        rows = []
+        for j in range(n):
+            asin = item_ids[start + j]
+            brand = f"Brand{brands[j]}"
+            product = PRODUCT_TYPES[products[j]]
+            feats = features[feature_idx[j]].tolist()
+            rows.append(
+                {
+                    "asin": asin,
+                    "title": f"{brand} {product} {series[j]}{models[j]}",
+                    "feature": feats,
+                    "description": f"{brand} {product} with {', '.join(feats[:2])}.",
+                    "price": float(prices[j]),
+                    "imageURL": f"https://images.example.com/{asin}.jpg",
+                    "imageURLHighRes": f"https://images.example.com/{asin}_hr.jpg",
+                    "also_buy": item_ids[also_buy[j]].tolist(),
+                    "also_viewed": item_ids[also_viewed[j]].tolist(),
+                    "brand": brand,
+                    "categories": [CATEGORY_PATHS[cats[j]]],
+                }
+            )
+        yield rows
+
+
+def _review_blocks(
+    user_ids: np.ndarray,
+    item_ids: np.ndarray,
+    item_cdf: np.ndarray,
+    item_order: np.ndarray,
+    behaviors_per_user: int,
+    seed: int,
+) -> Iterator[List[Dict[str, Any]]]:
+    ratings = np.array([2.0, 3.0, 4.0, 5.0])
+    colors = np.array(["Black", "White", "Blue"])
+    templates = FALLBACK_REVIEW_TEMPLATES
+    users = len(user_ids)
+    for block, start in enumerate(range(0, users, GENERATION_BLOCK)):
+        rng = _block_rng(seed, _REVIEW_STREAM, block)
+        end = min(start + GENERATION_BLOCK, users)
+        counts = _power_law_degrees(end - start, behaviors_per_user, len(item_ids), rng)
+        # At most one review per (user, item), as in the baseline generator
+        counts, asins = _sample_zipf_unique(item_cdf, item_order, counts, rng)
+        total = int(counts.sum())
+        owners = np.repeat(np.arange(start, end), counts)
+        # Position of each review within its user's sequence drives the timestamp
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        overall = rng.choice(ratings, total)
+        times = 1700000000 + offsets * 3600 + rng.integers(0, 601, total)
+        votes = rng.integers(0, 13, total)
+        verified = rng.random(total) < 0.5
+        style = rng.integers(0, len(colors), total)
+        template_idx = rng.integers(0, len(templates), total)
+        rows = []
+        for j in range(total):
+            asin = item_ids[asins[j]]
+            template = templates[template_idx[j]]
+            rows.append(
+                {
+                    "reviewerID": user_ids[owners[j]],
+                    "asin": asin,
+                    "reviewerName": f"Reviewer{owners[j]}",
+                    "overall": float(overall[j]),
+                    "reviewText": template["reviewText"],
+                    "summary": template["summary"],
+                    "unixReviewTime": int(times[j]),
+                    "reviewTime": "01 01, 2018",
+                    "vote": str(votes[j]),
+                    "verified": bool(verified[j]),
+                    "style": {"Color": colors[style[j]]},
+                    "image": [f"https://images.example.com/reviews/{asin}.jpg"],
+                }
+            )
+        yield rows
+
+
+def _edge_blocks(
+    user_ids: np.ndarray, user_cdf: np.ndarray, user_order: np.ndarray, social_degree: int, seed: int
+) -> Iterator[List[Dict[str, Any]]]:
+    edge_types = np.array(["follow", "friend"])
+    users = len(user_ids)
+    for block, start in enumerate(range(0, users if users > 1 else 0, GENERATION_BLOCK)):
+        rng = _block_rng(seed, _EDGE_STREAM, block)
+        end = min(start + GENERATION_BLOCK, users)
+        counts = _power_law_degrees(end - start, social_degree, users - 1, rng)
+        # Preferential attachment: targets follow the Zipf in-degree distribution,
+        # without self-loops or duplicate edges
+        counts, targets = _sample_zipf_unique(user_cdf, user_order, counts, rng, np.arange(start, end))
+        sources = np.repeat(np.arange(start, end), counts)
+        weights = np.round(rng.uniform(0.3, 1.0, len(sources)), 2)
+        types = rng.choice(edge_types, len(sources))
+        yield [
+            {
+                "source": user_ids[sources[j]],
+                "target": user_ids[targets[j]],
+                "weight": float(weights[j]),
+                "type": types[j],
+            }
+            for j in range(len(sources))
+        ]
+
+
+def generate_data_chunks(
+    users: int = 100_000,
+    items: int = 50_000,
+    behaviors_per_user: int = 20,
+    social_degree: int = 5,
+    seed: int = 42,
+    chunk_size: int = 50_000,
+    popularity_exponent: float = 1.1,
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    High-scale generator for load testing.
+
+    Yields (table, rows) chunks in load order (users, items, reviews,
+    social_edges) so memory is bounded by chunk_size plus one generation
+    block rather than dataset size.
+    Item popularity and social in-degree follow a Zipf law, review counts and
+    out-degree a Pareto law; behaviors_per_user / social_degree are means.
+    Like the baseline generator, a user reviews an item at most once, edges
+    are unique without self-loops, and also_buy / also_viewed are distinct
+    and never list the item itself.
+    Sampling is vectorized with NumPy over blocks of GENERATION_BLOCK
+    entities, each with its own RNG derived from (seed, table, block), so the
+    output is reproducible for a given seed whatever chunk_size is.
+    """
+    popularity_rng = _block_rng(seed, _POPULARITY_STREAM, 0)
+    user_ids = np.array([f"A{i:09d}" for i in range(users)])
+    item_ids = np.array([f"B{i:09d}" for i in range(items)])
+    item_cdf, item_order = _zipf_cdf(items, popularity_exponent, popularity_rng)
+    user_cdf, user_order = _zipf_cdf(users, popularity_exponent, popularity_rng)
+
+    for start in range(0, users, chunk_size):
+        end = min(start + chunk_size, users)
+        yield "users", [
+            {"reviewerID": user_ids[i], "reviewerName": f"Reviewer{i}", "meta": {"cold_start": False}}
+            for i in range(start, end)
+        ]
+    yield from _rechunk("items", _item_blocks(item_ids, item_cdf, item_order, seed), chunk_size)
+    yield from _rechunk(
+        "reviews", _review_blocks(user_ids, item_ids, item_cdf, item_order, behaviors_per_user, seed), chunk_size
+    )
+    yield from _rechunk("social_edges", _edge_blocks(user_ids, user_cdf, user_order, social_degree, seed), chunk_size)
@@ -1,11 +1,16 @@
+import asyncio
+import itertools
 import os
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
 
-from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-# Load .env
-load_dotenv()
+from app.core.config import settings
+from app.core.tracing import count_query
 
 # MySQL Configuration
 MYSQL_USER = os.getenv("MYSQL_USER", "root")
@@ -14,20 +19,210 @@ MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
 MYSQL_PORT = os.getenv("MYSQL_PORT", "3306")
 MYSQL_DB = os.getenv("MYSQL_DB", "uni_rec")
 
-DB_URL = f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+# DATABASE_URL (any async SQLAlchemy URL, e.g. sqlite+aiosqlite:///local.db) overrides MYSQL_*
+DB_URL = settings.database_url or f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+REPLICA_URLS = settings.database_replica_urls
 
-engine = create_async_engine(DB_URL, echo=False)
-async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+class PoolMetrics:
+    """Checkout counters and pool wait time for one engine."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long a checkout waits for a free connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            # sqlalchemy.exc.TimeoutError when pool_timeout elapses
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    options: Dict[str, Any] = {"echo": False, "pool_pre_ping": settings.db_pool_pre_ping}
+    parsed = make_url(url)
+    # In-memory SQLite lives in a single connection (StaticPool); sizing does not apply
+    if not (parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    engine = create_async_engine(url, **options)
+
+    metrics = PoolMetrics()
+    engine.sync_engine.pool.metrics = metrics
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        metrics.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record) -> None:
+        metrics.checkins += 1
+
+    if settings.tracing_enabled:
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _on_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+            count_query()
+
+    return engine
+
+
+# Created on first use (normally by the app lifespan) rather than at import,
+# so importing the app or a service module does not load the DB driver
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_replica_engines: List[AsyncEngine] = []
+_read_session_factories: List[async_sessionmaker] = []
+_next_replica = None
+
+
+def get_engine() -> AsyncEngine:
+    """The primary engine: every write (feedback, impressions) goes here."""
+    global _engine, _session_factory, _replica_engines, _read_session_factories, _next_replica
+    if _engine is None:
+        _engine = _create_engine(DB_URL)
+        _session_factory = async_sessionmaker(_engine, expire_on_commit=False)
+        # Replicas serve recommendation and analytics reads; without any, reads use the primary
+        _replica_engines = [_create_engine(url) for url in REPLICA_URLS] or [_engine]
+        _read_session_factories = [async_sessionmaker(e, expire_on_commit=False) for e in _replica_engines]
+        _next_replica = itertools.cycle(range(len(_read_session_factories)))
+    return _engine
+
+
+def all_engines() -> List[AsyncEngine]:
+    get_engine()
+    return [_engine] + [e for e in _replica_engines if e is not _engine]
+
+
+def __getattr__(name: str) -> Any:
+    # `from app.services.data_store import engine` keeps working
+    if name == "engine":
+        return get_engine()
+    if name == "async_session_factory":
+        get_engine()
+        return _session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def read_session_factory() -> AsyncSession:
+    """A session on the next replica (round robin)."""
+    get_engine()
+    return _read_session_factories[next(_next_replica)]()
+
+
+async def warm_up_pools(connections: int) -> None:
+    """Open `connections` connections per engine so the first requests do not pay for the handshakes."""
+    for engine in all_engines():
+        if connections <= 0 or not isinstance(engine.sync_engine.pool, AsyncAdaptedQueuePool):
+            await _ping(engine)
+            continue
+        # Held at the same time, otherwise the pool would hand out the same connection again
+        opened = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+        try:
+            errors = [c for c in opened if isinstance(c, BaseException)]
+            if errors:
+                raise errors[0]
+            await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in opened))
+        finally:
+            await asyncio.gather(
+                *(conn.close() for conn in opened if not isinstance(conn, BaseException)), return_exceptions=True
+            )
+
+
+async def _ping(engine: AsyncEngine) -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def ping_all(timeout: float) -> None:
+    """Raise if the primary or any replica does not answer SELECT 1 within `timeout` seconds."""
+    await asyncio.wait_for(asyncio.gather(*(_ping(e) for e in all_engines())), timeout=timeout)
+
+
+async def dispose_engines() -> None:
+    global _engine, _session_factory, _replica_engines, _read_session_factories, _next_replica
+    if _engine is None:
+        return
+    for engine in all_engines():
+        await engine.dispose()
+    _engine, _session_factory, _replica_engines, _read_session_factories, _next_replica = None, None, [], [], None
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency for FastAPI routes"""
-    async with async_session_factory() as session:
+    """Dependency for FastAPI routes that write; bound to the primary"""
+    get_engine()
+    async with _session_factory() as session:
+        yield session
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for read-only routes; bound to a replica.
+
+    Replicas may lag the primary: feedback a user just sent is still covered
+    by the write-behind buffer overlay until it is flushed, but a row flushed
+    moments ago can be missing on a lagging replica.
+    """
+    async with read_session_factory() as session:
         yield session
 
-# In-memory cache for last recommendations (temporary storage)
-# In production, use Redis
-last_recommendations_cache = {}
 
-# Feedback cache (buffer before flush to DB, or just simple in-memory for now)
-# In this refactor, we will write feedback directly to DB
+def _engine_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    pool = engine.sync_engine.pool
+    metrics: PoolMetrics = pool.metrics
+    stats: Dict[str, Any] = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool": type(pool).__name__,
+        "connects": metrics.connects,
+        "checkouts": metrics.checkouts,
+        "checkins": metrics.checkins,
+        "in_use": metrics.checkouts - metrics.checkins,
+        "timeouts": metrics.timeouts,
+        "avg_wait_ms": round(metrics.wait_seconds / metrics.checkouts * 1000, 3) if metrics.checkouts else 0.0,
+        "max_wait_ms": round(metrics.max_wait_seconds * 1000, 3),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+    return stats
+
+
+def pool_stats() -> Dict[str, Any]:
+    primary, *replicas = all_engines()
+    return {"primary": _engine_stats(primary), "replicas": [_engine_stats(e) for e in replicas]}
+
+# Served recommendations are logged to the impressions table by
+# app.services.impressions (buffered, flushed in the background)
+
+# Feedback is written behind by app.services.feedback_buffer
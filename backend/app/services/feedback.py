@@ -1,28 +1,35 @@
+import time
 from typing import Any, Dict
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.tracing import span
 from app.models.sql_models import Review
-import time
+from app.services.feedback_buffer import feedback_buffer, review_row
+from app.services.item_index import item_index
+from app.services.metrics import metrics_aggregator
+from app.services.rec_cache import recommendation_cache
+from app.services.user_context import user_contexts
+
 
 async def add_feedback(session: AsyncSession, reviewer_id: str, asin: str, score: int) -> Dict[str, Any]:
     current_time = int(time.time())
-    
-    # Map score to review properties
-    overall = float(score)
-    summary = "Feedback"
-    text = f"User rated this item {score} stars."
 
-    new_review = Review(
-        reviewerID=reviewer_id,
-        asin=asin,
-        overall=overall,
-        summary=summary,
-        reviewText=text,
-        unixReviewTime=current_time,
-        verified=True, # Mark as verified to distinguish or just for weight
-        vote="0"
-    )
-    
-    session.add(new_review)
-    await session.commit()
-        
+    with span("feedback.write"):
+        if feedback_buffer.running and feedback_buffer.has_room(reviewer_id, asin):
+            # Acknowledge now; the row is written by the background flush
+            is_new = feedback_buffer.submit(reviewer_id, asin, score, current_time)
+        else:
+            # No flusher (scripts, tests) or the buffer is full: write through as before
+            await session.execute(insert(Review.__table__), [review_row(reviewer_id, asin, score, current_time)])
+            await session.commit()
+            is_new = True
+
+    # In-memory views are updated synchronously so the next recommendation reflects this
+    with span("feedback.update_views"):
+        if is_new:
+            item_index.record_review(asin)
+            metrics_aggregator.record_feedback(reviewer_id, asin)
+        user_contexts.invalidate(reviewer_id)
+        await recommendation_cache.invalidate(reviewer_id)
+
     return {"reviewerID": reviewer_id, "asin": asin, "score": score, "timestamp": current_time}
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert
+from app.core.config import settings
+from app.core.tracing import span
+from app.models.sql_models import Review
+from app.services.scoring import HISTORY_LIMIT
+
+MAX_BACKOFF_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def review_row(reviewer_id: str, asin: str, score: int, current_time: int) -> Dict[str, Any]:
+    # Map score to review properties
+    return {
+        "reviewerID": reviewer_id,
+        "asin": asin,
+        "overall": float(score),
+        "summary": "Feedback",
+        "reviewText": f"User rated this item {score} stars.",
+        "unixReviewTime": current_time,
+        "verified": True, # Mark as verified to distinguish or just for weight
+        "vote": "0",
+    }
+
+
+class FeedbackBuffer:
+    """
+    Write-behind queue for POST /api/feedback.
+
+    Events are acknowledged immediately and coalesced per (reviewer, asin):
+    a like followed by a dislike before the flush becomes one row carrying
+    the latest score. A background task inserts pending rows in one batch
+    every FEEDBACK_FLUSH_INTERVAL_MS or once FEEDBACK_FLUSH_MAX_EVENTS are
+    pending, and drains on shutdown. Until a row is committed, the readers
+    below let history lookups overlay it so recommendations see it right away.
+
+    The buffer holds at most FEEDBACK_MAX_PENDING rows (pending plus the batch
+    being written). When it is full, for example while the DB is down,
+    has_room() is False and callers write through synchronously, so a failing
+    DB pushes back on clients instead of growing memory.
+    """
+
+    def __init__(self) -> None:
+        self.flush_interval = settings.feedback_flush_interval_ms / 1000.0
+        self.max_events = settings.feedback_flush_max_events
+        self.max_pending = settings.feedback_max_pending
+        self.pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Batch currently being written; still visible to readers until commit
+        self.inflight: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self.engine = None
+        self.received = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failures = 0
+        self.overflows = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def has_room(self, reviewer_id: str, asin: str) -> bool:
+        """Whether submit() may take this event: it coalesces, or the buffer is under its cap."""
+        if (reviewer_id, asin) in self.pending or len(self.pending) + len(self.inflight) < self.max_pending:
+            return True
+        self.overflows += 1
+        return False
+
+    def submit(self, reviewer_id: str, asin: str, score: int, current_time: int) -> bool:
+        """Queue one event; returns True if it will become a new row."""
+        key = (reviewer_id, asin)
+        self.received += 1
+        is_new = key not in self.pending
+        if not is_new:
+            self.coalesced += 1
+        self.pending[key] = review_row(reviewer_id, asin, score, current_time)
+        self._by_user.setdefault(reviewer_id, set()).add(asin)
+        if self._wakeup is not None and len(self.pending) >= self.max_events:
+            self._wakeup.set()
+        return is_new
+
+    def _unflushed(self, reviewer_id: str) -> List[Dict[str, Any]]:
+        rows = []
+        for asin in self._by_user.get(reviewer_id, ()):
+            row = self.pending.get((reviewer_id, asin)) or self.inflight.get((reviewer_id, asin))
+            if row is not None:
+                rows.append(row)
+        rows.sort(key=lambda r: r["unixReviewTime"], reverse=True)
+        return rows
+
+    def pending_count(self, reviewer_id: str) -> int:
+        return len(self._by_user.get(reviewer_id, ()))
+
+    def pending_events(self, reviewer_id: str) -> List[Dict[str, Any]]:
+        """Unflushed feedback rows of one user, newest first."""
+        return self._unflushed(reviewer_id)
+
+    def merge_history(self, reviewer_id: str, recent_asins: List[str], limit: int = HISTORY_LIMIT) -> List[str]:
+        """Prepend unflushed feedback to a newest-first asin history from the DB."""
+        pending = [row["asin"] for row in self._unflushed(reviewer_id)]
+        if not pending:
+            return recent_asins
+        seen = set(pending)
+        return (pending + [a for a in recent_asins if a not in seen])[:limit]
+
+    def start(self, engine=None) -> None:
+        if self._task is not None:
+            return
+        if engine is None:
+            from app.services.data_store import get_engine
+
+            engine = get_engine()
+        self.engine = engine
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still pending, then stop the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                self.failures += 1
+                delay = min(max(delay, 0.5) * 2, MAX_BACKOFF_SECONDS)
+                logger.warning("feedback flush failed, retrying in %.1fs: %r", delay, e)
+                if self._stopping:
+                    logger.error("dropping %d unflushed feedback events on shutdown", len(self.pending))
+                    return
+            if self._stopping and not self.pending:
+                return
+
+    async def flush(self) -> int:
+        if not self.pending:
+            return 0
+        self.inflight, self.pending = self.pending, {}
+        batch = list(self.inflight.values())
+        try:
+            with span("feedback.flush"):
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(Review.__table__), batch)
+        except Exception:
+            # Keep the batch, unless a newer event for the same key arrived meanwhile
+            for key, row in self.inflight.items():
+                self.pending.setdefault(key, row)
+            raise
+        finally:
+            flushed, self.inflight = self.inflight, {}
+            for reviewer_id, asin in flushed:
+                if (reviewer_id, asin) not in self.pending:
+                    asins = self._by_user.get(reviewer_id)
+                    if asins is not None:
+                        asins.discard(asin)
+                        if not asins:
+                            del self._by_user[reviewer_id]
+        self.written += len(batch)
+        return len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "failures": self.failures,
+            "overflows": self.overflows,
+        }
+
+
+feedback_buffer = FeedbackBuffer()
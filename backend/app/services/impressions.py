@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.models.sql_models import Impression
+
+BUFFER_CAPACITY = 100_000
+FLUSH_BATCH_SIZE = 1000
+FLUSH_INTERVAL_SECONDS = 1.0
+# Flush early once the buffer is this full
+HIGH_WATERMARK = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class ImpressionLogger:
+    """
+    Records which items were served, without ever blocking the request path.
+
+    record() appends to a bounded in-process ring buffer. A background task
+    drains it into the impressions table with multi-row inserts every
+    FLUSH_INTERVAL_SECONDS, or sooner past the high watermark. Loss is
+    bounded: when the DB falls behind and the buffer is full, the oldest
+    records are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int = BUFFER_CAPACITY) -> None:
+        self.capacity = capacity
+        self.buffer: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.engine = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def record(self, reviewer_id: str, module: str, items: List[Dict[str, Any]]) -> None:
+        now = int(time.time())
+        for rank, item in enumerate(items, start=1):
+            if len(self.buffer) == self.capacity:
+                self.dropped += 1
+            self.buffer.append(
+                {
+                    "reviewerID": reviewer_id,
+                    "asin": item["asin"],
+                    "rank": rank,
+                    "module": module,
+                    "score": float(item.get("score") or 0.0),
+                    "timestamp": now,
+                }
+            )
+        self.recorded += len(items)
+        if self._wakeup is not None and len(self.buffer) >= self.capacity * HIGH_WATERMARK:
+            self._wakeup.set()
+
+    def start(self, engine=None) -> None:
+        if self._task is not None:
+            return
+        if engine is None:
+            from app.services.data_store import get_engine
+
+            engine = get_engine()
+        self.engine = engine
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and drain whatever is still buffered."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        backoff = FLUSH_INTERVAL_SECONDS
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while self.buffer:
+                    await self.flush_once()
+                backoff = FLUSH_INTERVAL_SECONDS
+            except Exception as e:
+                self.failures += 1
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                print(f"[Impressions] flush failed, retrying in {backoff:.0f}s: {e!r}")
+                if self._stopping:
+                    self.dropped += len(self.buffer)
+                    self.buffer.clear()
+            if self._stopping and not self.buffer:
+                return
+
+    async def flush_once(self) -> int:
+        batch = [self.buffer.popleft() for _ in range(min(FLUSH_BATCH_SIZE, len(self.buffer)))]
+        if not batch:
+            return 0
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(insert(Impression.__table__), batch)
+        except Exception:
+            # Put the batch back in front; anything past capacity is the oldest and gets dropped
+            overflow = len(batch) + len(self.buffer) - self.capacity
+            if overflow > 0:
+                self.dropped += overflow
+                batch = batch[overflow:]
+            self.buffer.extendleft(reversed(batch))
+            raise
+        self.written += len(batch)
+        return len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self.buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+impression_logger = ImpressionLogger()
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.sql_models import Item
+
+VECTOR_DIM = 128
+# Hashed n-gram space; the projection matrix is HASH_FEATURES x VECTOR_DIM float32 (128 MB) at build time only
+HASH_FEATURES = 1 << 18
+PROJECTION_SEED = 42
+# Term weights per field: the title says most about what an item is
+FIELD_WEIGHTS = (("title", 2.0), ("brand", 1.0), ("feature", 1.5), ("description", 1.0))
+# Items projected at once: the gathered rows (nnz x VECTOR_DIM) stay around 100 MB
+PROJECT_CHUNK = 4096
+# Catalogue rows scored per matrix product at query time
+QUERY_BLOCK = 65536
+# Bound on the token -> bucket memo (distinct tokens, not occurrences)
+TOKEN_CACHE_SIZE = 2_000_000
+# How often ensure() checks vectors.npy for a newer offline build
+RELOAD_CHECK_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'.][a-z0-9]+)*|[\u4e00-\u9fff]+")
+
+
+def default_embedding_dir() -> Path:
+    base = Path(settings.data_dir) if settings.data_dir else Path(__file__).resolve().parents[2] / "data"
+    return base / "item_embeddings"
+
+
+class HashedNgrams:
+    """
+    Item text -> (bucket ids, term counts) over HASH_FEATURES buckets.
+
+    Latin words give unigrams and adjacent bigrams, CJK runs give character
+    bigrams; brand and each feature also count as one whole-phrase token.
+    crc32 keeps buckets stable across processes, unlike hash().
+    """
+
+    def __init__(self, n_features: int = HASH_FEATURES) -> None:
+        self.mask = n_features - 1
+        self._buckets: Dict[str, int] = {}
+
+    def _bucket(self, token: str) -> int:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            bucket = zlib.crc32(token.encode("utf-8")) & self.mask
+            if len(self._buckets) < TOKEN_CACHE_SIZE:
+                self._buckets[token] = bucket
+        return bucket
+
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        tokens: List[str] = []
+        previous = None
+        for match in TOKEN_PATTERN.finditer(text.lower()):
+            word = match.group()
+            if "\u4e00" <= word[0] <= "\u9fff":
+                tokens.extend(word[i : i + 2] for i in range(max(len(word) - 1, 1)))
+                previous = None
+                continue
+            tokens.append(word)
+            if previous is not None:
+                tokens.append(f"{previous} {word}")
+            previous = word
+        return tokens
+
+    def __call__(self, item: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        counts: Dict[int, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            value = item.get(field)
+            if not value:
+                continue
+            texts = value if isinstance(value, list) else [value]
+            for text in texts:
+                text = str(text)
+                if field in ("brand", "feature"):
+                    bucket = self._bucket(f"{field}={text.strip().lower()}")
+                    counts[bucket] = counts.get(bucket, 0.0) + weight
+                for token in self.tokens(text):
+                    bucket = self._bucket(token)
+                    counts[bucket] = counts.get(bucket, 0.0) + weight
+        return np.fromiter(counts.keys(), np.int32, len(counts)), np.fromiter(counts.values(), np.float32, len(counts))
+
+
+def build_item_vectors(
+    items: Iterable[Dict[str, Any]],
+    directory: Optional[Path] = None,
+    dim: int = VECTOR_DIM,
+    n_features: int = HASH_FEATURES,
+    seed: int = PROJECTION_SEED,
+) -> "ItemEmbeddings":
+    """
+    Offline build of L2-normalized item vectors.
+
+    TF-IDF (sublinear tf) over hashed n-grams of title / brand / feature /
+    description, reduced to `dim` dimensions by a Gaussian random projection.
+    The hashed counts are kept as CSR arrays between the featurizing pass and
+    the projection pass, since IDF needs every document first. With a
+    directory the output is written straight into a memory-mapped vectors.npy
+    instead of being held in memory.
+    """
+    featurize = HashedNgrams(n_features)
+    asins: List[str] = []
+    indptr = [0]
+    index_parts: List[np.ndarray] = []
+    count_parts: List[np.ndarray] = []
+    for item in items:
+        ids, counts = featurize(item)
+        asins.append(item["asin"])
+        index_parts.append(ids)
+        count_parts.append(counts)
+        indptr.append(indptr[-1] + len(ids))
+
+    indices = np.concatenate(index_parts) if index_parts else np.zeros(0, dtype=np.int32)
+    counts = np.concatenate(count_parts) if count_parts else np.zeros(0, dtype=np.float32)
+    del index_parts, count_parts
+    offsets = np.asarray(indptr, dtype=np.int64)
+    # Buckets are unique within an item, so bucket occurrences are document frequencies
+    df = np.bincount(indices, minlength=n_features)
+    idf = (np.log((1.0 + len(asins)) / (1.0 + df)) + 1.0).astype(np.float32)
+    projection = np.random.default_rng(seed).standard_normal((n_features, dim), dtype=np.float32)
+
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors = np.lib.format.open_memmap(
+            directory / ItemEmbeddings.FILE, mode="w+", dtype=np.float32, shape=(len(asins), dim)
+        )
+    else:
+        vectors = np.zeros((len(asins), dim), dtype=np.float32)
+
+    for start in range(0, len(asins), PROJECT_CHUNK):
+        end = min(start + PROJECT_CHUNK, len(asins))
+        lo, hi = offsets[start], offsets[end]
+        weights = (1.0 + np.log(counts[lo:hi])) * idf[indices[lo:hi]]
+        gathered = projection[indices[lo:hi]] * weights[:, None]
+        # Segment sums per item; items without any token keep a zero vector
+        row_starts = offsets[start:end] - lo
+        non_empty = np.diff(offsets[start : end + 1]) > 0
+        block = np.zeros((end - start, dim), dtype=np.float32)
+        if non_empty.any():
+            block[non_empty] = np.add.reduceat(gathered, row_starts[non_empty], axis=0)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        vectors[start:end] = block / np.maximum(norms, 1e-12)
+
+    embeddings = ItemEmbeddings(asins, vectors)
+    if directory is not None:
+        vectors.flush()
+        (directory / "asins.json").write_text(json.dumps(asins), encoding="utf-8")
+    return embeddings
+
+
+class ItemEmbeddings:
+    """Row-aligned asins and unit-length float32 item vectors (memory-mapped when loaded)."""
+
+    FILE = "vectors.npy"
+
+    def __init__(self, asins: List[str], vectors: np.ndarray) -> None:
+        self.asins = asins
+        self.positions = {asin: pos for pos, asin in enumerate(asins)}
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / self.FILE, np.asarray(self.vectors, dtype=np.float32))
+        (directory / "asins.json").write_text(json.dumps(self.asins), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "ItemEmbeddings":
+        """The matrix is memory-mapped so several workers share the page cache."""
+        vectors = np.load(directory / cls.FILE, mmap_mode="r")
+        asins = json.loads((directory / "asins.json").read_text(encoding="utf-8"))
+        if len(asins) != vectors.shape[0]:
+            # Caught between the two renames of publish(); the next check picks up the pair
+            raise ValueError(f"{len(asins)} asins for {vectors.shape[0]} vectors")
+        return cls(asins, vectors)
+
+    @staticmethod
+    def publish(staging: Path, directory: Path) -> None:
+        """
+        Move a finished build into place by renaming, never rewriting the live
+        files: workers that have the old vectors.npy mapped keep reading it.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        os.replace(staging / "asins.json", directory / "asins.json")
+        os.replace(staging / ItemEmbeddings.FILE, directory / ItemEmbeddings.FILE)
+        staging.rmdir()
+
+    def user_vector(self, recent_asins: Sequence[str]) -> Optional[np.ndarray]:
+        """Mean of the history's item vectors (newest first), with the recency decay used elsewhere."""
+        rows, weights = [], []
+        for idx, asin in enumerate(recent_asins):
+            pos = self.positions.get(asin)
+            if pos is not None:
+                rows.append(pos)
+                weights.append(1.0 / (1.0 + idx * 0.1))
+        if not rows:
+            return None
+        vector = np.asarray(weights, dtype=np.float32) @ self.vectors[np.asarray(rows)]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def recommend_batch(self, histories: Sequence[Sequence[str]], top_k: int) -> List[List[Tuple[str, float]]]:
+        """
+        Cosine nearest items to each user vector, excluding the history.
+
+        Exact search: the catalogue is scored in QUERY_BLOCK row blocks for
+        all users at once, so memory stays at one block of scores regardless
+        of catalogue size. The first block seeds a top-k per user; later
+        blocks only merge the scores above each user's current k-th best,
+        which after the first block are a handful per user.
+        """
+        results: List[List[Tuple[str, float]]] = [[] for _ in histories]
+        users = [(i, self.user_vector(history)) for i, history in enumerate(histories)]
+        users = [(i, vector) for i, vector in users if vector is not None]
+        if not users or top_k <= 0:
+            return results
+        matrix = np.stack([vector for _, vector in users])
+        seen = [
+            np.asarray(sorted({self.positions[a] for a in histories[i] if a in self.positions}), dtype=np.int64)
+            for i, _ in users
+        ]
+        best_scores = np.full((len(users), top_k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(users), top_k), dtype=np.int64)
+        for start in range(0, len(self.asins), QUERY_BLOCK):
+            end = min(start + QUERY_BLOCK, len(self.asins))
+            # (users, block rows): BLAS writes a contiguous row per user without a transpose copy
+            scores = matrix @ self.vectors[start:end].T
+            for u, positions in enumerate(seen):
+                inside = positions[(positions >= start) & (positions < end)]
+                scores[u, inside - start] = -np.inf
+            threshold = best_scores.min(axis=1)
+            if np.isneginf(threshold).any():
+                if end - start > top_k:
+                    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                else:
+                    top = np.broadcast_to(np.arange(end - start), scores.shape)
+                candidates = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                rows = np.concatenate([best_rows, top + start], axis=1)
+                order = np.argsort(-candidates, axis=1)[:, :top_k]
+                best_scores = np.take_along_axis(candidates, order, axis=1)
+                best_rows = np.take_along_axis(rows, order, axis=1)
+                continue
+            # A row max per user is cheaper than comparing every score
+            for u in np.nonzero(scores.max(axis=1) > threshold)[0]:
+                mine = np.nonzero(scores[u] > threshold[u])[0]
+                candidates = np.concatenate([best_scores[u], scores[u, mine]])
+                rows = np.concatenate([best_rows[u], mine + start])
+                order = np.argsort(-candidates)[:top_k]
+                best_scores[u] = candidates[order]
+                best_rows[u] = rows[order]
+
+        for (i, _), scores, rows in zip(users, best_scores, best_rows):
+            results[i] = [
+                (self.asins[row], round(float(score), 4)) for score, row in zip(scores, rows) if np.isfinite(score)
+            ]
+        return results
+
+    def recommend(self, recent_asins: Sequence[str], top_k: int) -> List[Tuple[str, float]]:
+        return self.recommend_batch([recent_asins], top_k)[0]
+
+
+async def load_embedding_inputs(session: AsyncSession) -> List[Dict[str, Any]]:
+    result = await session.execute(select(Item.asin, Item.title, Item.brand, Item.feature, Item.description))
+    return [
+        {"asin": asin, "title": title, "brand": brand, "feature": feature, "description": description}
+        for asin, title, brand, feature, description in result
+    ]
+
+
+class EmbeddingStore:
+    """
+    Loads the offline vectors written by scripts/build_item_embeddings.py.
+
+    There is no online build: it would read every item's text and allocate
+    the projection matrix inside a request. Until a build exists ensure()
+    returns None and content requests fall back to sequence. vectors.npy is
+    checked every RELOAD_CHECK_SECONDS and reloaded when a newer build was
+    published, so items added since the last build appear after the next one.
+    """
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = directory
+        self.embeddings: Optional[ItemEmbeddings] = None
+        self._mtime: Optional[int] = None
+        self._checked_at = float("-inf")
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _directory(self) -> Path:
+        return self.directory or default_embedding_dir()
+
+    def available(self) -> bool:
+        """Whether an offline build exists."""
+        return (self._directory() / ItemEmbeddings.FILE).exists()
+
+    async def ensure(self) -> Optional[ItemEmbeddings]:
+        if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+            return self.embeddings
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+                return self.embeddings
+            self._checked_at = time.monotonic()
+            try:
+                mtime = (self._directory() / ItemEmbeddings.FILE).stat().st_mtime_ns
+            except FileNotFoundError:
+                return self.embeddings
+            if mtime != self._mtime:
+                try:
+                    # Parsing asins.json is O(items): keep it off the event loop
+                    self.embeddings = await asyncio.get_running_loop().run_in_executor(
+                        None, ItemEmbeddings.load, self._directory()
+                    )
+                    self._mtime = mtime
+                except (OSError, ValueError) as e:
+                    logger.warning("could not load item embeddings, keeping the previous ones: %s", e)
+        return self.embeddings
+
+
+item_embeddings = EmbeddingStore()
@@ -0,0 +1,228 @@
+import asyncio
+import heapq
+import itertools
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import Item, Review
+
+# How often ensure() checks the items table for rows added since the last build.
+REFRESH_INTERVAL_SECONDS = 300
+UNKNOWN_CATEGORY = "Unknown"
+
+# Monotonic across rebuilds so derived views (e.g. NumPy copies) can detect changes.
+_versions = itertools.count(1)
+
+
+def leaf_category(categories: Optional[List[List[str]]]) -> str:
+    return categories[0][-1] if categories and categories[0] else UNKNOWN_CATEGORY
+
+
+class ItemIndex:
+    """
+    Process-resident catalogue index.
+
+    Items are addressed by a dense position. Per-item attributes live in
+    parallel compact arrays so candidate generation never touches the DB:
+    - asins / category_ids / prices / popularity
+    - postings: category id -> positions of the items in that leaf category
+    """
+
+    def __init__(self) -> None:
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.asins: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.category_names: List[str] = []
+        self.category_lookup: Dict[str, int] = {}
+        self.category_ids = array("i")
+        self.prices = array("d")
+        self.popularity = array("q")
+        self.max_popularity = 0
+        self.postings: Dict[int, array] = {}
+        # Display fields returned with recommendations
+        self.titles: List[str] = []
+        self.categories: List[Optional[List[List[str]]]] = []
+        self.image_urls: List[Optional[str]] = []
+        self.built = False
+        self.refreshed_at = 0.0
+        self.version = next(_versions)
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    def __contains__(self, asin: str) -> bool:
+        return asin in self.positions
+
+    def _category_id(self, name: str) -> int:
+        cid = self.category_lookup.get(name)
+        if cid is None:
+            cid = len(self.category_names)
+            self.category_lookup[name] = cid
+            self.category_names.append(name)
+            self.postings[cid] = array("i")
+        return cid
+
+    def add_item(
+        self,
+        asin: str,
+        title: str,
+        price: Optional[float],
+        categories: Optional[List[List[str]]],
+        image_url: Optional[str],
+    ) -> int:
+        pos = self.positions.get(asin)
+        if pos is not None:
+            return pos
+        pos = len(self.asins)
+        cid = self._category_id(leaf_category(categories))
+        self.asins.append(asin)
+        self.positions[asin] = pos
+        self.category_ids.append(cid)
+        self.prices.append(float(price or 0.0))
+        self.popularity.append(0)
+        self.postings[cid].append(pos)
+        self.titles.append(title)
+        self.categories.append(categories)
+        self.image_urls.append(image_url)
+        self.version = next(_versions)
+        return pos
+
+    def record_review(self, asin: str, count: int = 1) -> None:
+        """Bump popularity in place, e.g. right after feedback is written."""
+        pos = self.positions.get(asin)
+        if pos is not None:
+            self.popularity[pos] += count
+            if self.popularity[pos] > self.max_popularity:
+                self.max_popularity = self.popularity[pos]
+            self.version = next(_versions)
+
+    def item(self, asin: str) -> Optional[Dict[str, Any]]:
+        pos = self.positions.get(asin)
+        return self.meta(pos) if pos is not None else None
+
+    def meta(self, pos: int) -> Dict[str, Any]:
+        return {
+            "title": self.titles[pos],
+            "categories": self.categories[pos],
+            "imageURL": self.image_urls[pos],
+            "price": self.prices[pos],
+        }
+
+    async def _load_items(self, session: AsyncSession, asins: Optional[Iterable[str]] = None) -> int:
+        stmt = select(Item.asin, Item.title, Item.price, Item.categories, Item.imageURL)
+        if asins is not None:
+            stmt = stmt.where(Item.asin.in_(list(asins)))
+        result = await session.execute(stmt)
+        added = 0
+        for asin, title, price, categories, image_url in result:
+            if asin not in self.positions:
+                self.add_item(asin, title, price, categories, image_url)
+                added += 1
+        return added
+
+    async def build(self, session: AsyncSession) -> None:
+        """Full rebuild from the items/reviews tables, swapped in atomically."""
+        fresh = ItemIndex()
+        await fresh._load_items(session)
+        result = await session.execute(select(Review.asin, func.count()).group_by(Review.asin))
+        for asin, count in result:
+            fresh.record_review(asin, count)
+        self._adopt(fresh)
+
+    def _adopt(self, fresh: "ItemIndex") -> None:
+        # No await between these assignments, so coroutines on the loop see either
+        # the old index or the new one; the lock and identity of self are kept
+        self.asins = fresh.asins
+        self.positions = fresh.positions
+        self.category_names = fresh.category_names
+        self.category_lookup = fresh.category_lookup
+        self.category_ids = fresh.category_ids
+        self.prices = fresh.prices
+        self.popularity = fresh.popularity
+        self.max_popularity = fresh.max_popularity
+        self.postings = fresh.postings
+        self.titles = fresh.titles
+        self.categories = fresh.categories
+        self.image_urls = fresh.image_urls
+        self.version = fresh.version
+        self.built = True
+        self.refreshed_at = time.time()
+
+    async def refresh(self, session: AsyncSession) -> int:
+        """Incrementally pick up items inserted since the last build/refresh."""
+        result = await session.execute(select(func.count()).select_from(Item))
+        total = result.scalar() or 0
+        added = 0
+        if total > len(self.asins):
+            result = await session.execute(select(Item.asin))
+            missing = [row[0] for row in result if row[0] not in self.positions]
+            # Chunk the IN (...) lists to stay well under driver parameter limits
+            for i in range(0, len(missing), 500):
+                added += await self._load_items(session, missing[i : i + 500])
+        self.refreshed_at = time.time()
+        return added
+
+    async def ensure(self, session: AsyncSession) -> "ItemIndex":
+        if self.built and time.time() - self.refreshed_at < REFRESH_INTERVAL_SECONDS:
+            return self
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.built:
+                await self.build(session)
+            elif time.time() - self.refreshed_at >= REFRESH_INTERVAL_SECONDS:
+                await self.refresh(session)
+        return self
+
+    def score(
+        self, preferences: Dict[str, float], exclude: Set[str], top_k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank items from the preferred categories' posting lists.
+
+        score = 0.8 * normalized category preference + 0.2 * normalized popularity.
+        When the preferred categories cannot fill top_k, the remaining slots are
+        filled with the most popular unseen items.
+
+        Per-item Python reference; the request path uses scoring.SequenceScorer.
+        """
+        excluded = {self.positions[a] for a in exclude if a in self.positions}
+        max_pop = self.max_popularity or 1
+        max_pref = max(preferences.values()) if preferences else 0.0
+
+        candidates: List[Tuple[float, int]] = []
+        for name, pref in preferences.items():
+            cid = self.category_lookup.get(name)
+            if cid is None or pref <= 0:
+                continue
+            base = 0.8 * pref / max_pref
+            for pos in self.postings[cid]:
+                if pos in excluded:
+                    continue
+                candidates.append((base + 0.2 * self.popularity[pos] / max_pop, pos))
+        ranked = heapq.nlargest(top_k, candidates)
+
+        if len(ranked) < top_k:
+            taken = excluded | {pos for _, pos in ranked}
+            fill = heapq.nlargest(
+                top_k - len(ranked) + len(taken),
+                range(len(self.asins)),
+                key=self.popularity.__getitem__,
+            )
+            for pos in fill:
+                if len(ranked) >= top_k:
+                    break
+                if pos not in taken:
+                    ranked.append((0.2 * self.popularity[pos] / max_pop, pos))
+        return [(pos, round(score, 4)) for score, pos in ranked]
+
+
+item_index = ItemIndex()
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.sql_models import Item, Review
+
+ALSO_BUY_WEIGHT = 1.0
+ALSO_VIEWED_WEIGHT = 0.5
+CO_REVIEW_WEIGHT = 0.2
+# Only the most recent reviews of each user contribute co-review pairs (O(h^2) per user)
+CO_REVIEW_WINDOW = 20
+DEFAULT_TOP_N = 50
+# How often the serving store looks for a newer offline build
+RELOAD_CHECK_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def default_table_dir() -> Path:
+    base = Path(settings.data_dir) if settings.data_dir else Path(__file__).resolve().parents[2] / "data"
+    return base / "item_neighbors"
+
+
+def build_neighbor_table(
+    items: Iterable[Dict[str, Any]],
+    user_histories: Iterable[List[str]],
+    top_n: int = DEFAULT_TOP_N,
+) -> "ItemNeighbors":
+    """
+    Offline build of the top-N item-item neighbor table.
+
+    Edge weight = 1.0 * also_buy + 0.5 * also_viewed + 0.2 * co-review count,
+    where a co-review is two items in the same user's recent window.
+    """
+    asins: List[str] = []
+    positions: Dict[str, int] = {}
+    pending: List[Tuple[str, List[str], List[str]]] = []
+    for item in items:
+        positions[item["asin"]] = len(asins)
+        asins.append(item["asin"])
+        pending.append((item["asin"], item.get("also_buy") or [], item.get("also_viewed") or []))
+
+    weights: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    for asin, also_buy, also_viewed in pending:
+        src = positions[asin]
+        for other in also_buy:
+            dst = positions.get(other)
+            if dst is not None and dst != src:
+                weights[src][dst] += ALSO_BUY_WEIGHT
+        for other in also_viewed:
+            dst = positions.get(other)
+            if dst is not None and dst != src:
+                weights[src][dst] += ALSO_VIEWED_WEIGHT
+
+    for history in user_histories:
+        window = [positions[a] for a in history[:CO_REVIEW_WINDOW] if a in positions]
+        for i, a in enumerate(window):
+            for b in window[i + 1 :]:
+                if a != b:
+                    weights[a][b] += CO_REVIEW_WEIGHT
+                    weights[b][a] += CO_REVIEW_WEIGHT
+
+    indptr = np.zeros(len(asins) + 1, dtype=np.int64)
+    indices: List[int] = []
+    values: List[float] = []
+    for src in range(len(asins)):
+        row = weights.get(src)
+        if row:
+            for dst, weight in heapq.nlargest(top_n, row.items(), key=lambda x: x[1]):
+                indices.append(dst)
+                values.append(weight)
+        indptr[src + 1] = len(indices)
+
+    return ItemNeighbors(
+        asins,
+        indptr,
+        np.asarray(indices, dtype=np.int32),
+        np.asarray(values, dtype=np.float32),
+    )
+
+
+class ItemNeighbors:
+    """Top-N item-item neighbors stored as CSR arrays (indptr / indices / weights)."""
+
+    FILES = ("indptr.npy", "indices.npy", "weights.npy")
+
+    def __init__(
+        self,
+        asins: List[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+    ) -> None:
+        self.asins = asins
+        self.positions = {asin: pos for pos, asin in enumerate(asins)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1]) if len(self.indptr) else 0
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, array in zip(self.FILES, (self.indptr, self.indices, self.weights)):
+            np.save(directory / name, array)
+        (directory / "asins.json").write_text(json.dumps(self.asins), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "ItemNeighbors":
+        """Arrays are memory-mapped so several workers share the page cache."""
+        arrays = [np.load(directory / name, mmap_mode="r") for name in cls.FILES]
+        asins = json.loads((directory / "asins.json").read_text(encoding="utf-8"))
+        indptr, indices, weights = arrays
+        if len(indptr) != len(asins) + 1 or len(indices) != len(weights) or int(indptr[-1]) != len(indices):
+            raise ValueError(f"neighbor table in {directory} is inconsistent (partially published?)")
+        return cls(asins, *arrays)
+
+    @classmethod
+    def publish(cls, staging: Path, directory: Path) -> None:
+        """
+        Move a finished build into place by renaming, never rewriting the live
+        files. indptr.npy goes last: its mtime is what the serving store watches.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("asins.json", *reversed(cls.FILES)):
+            os.replace(staging / name, directory / name)
+        staging.rmdir()
+
+    def neighbors(self, asin: str) -> List[Tuple[str, float]]:
+        pos = self.positions.get(asin)
+        if pos is None:
+            return []
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return [
+            (self.asins[dst], float(w))
+            for dst, w in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist())
+        ]
+
+    def recommend(self, recent_asins: List[str], top_k: int) -> List[Tuple[str, float]]:
+        """
+        Sum neighbor weights over the user's history (newest first), with the
+        same recency decay as compute_category_preferences. O(history x N).
+        """
+        seen = set(recent_asins)
+        scores: Dict[int, float] = defaultdict(float)
+        for idx, asin in enumerate(recent_asins):
+            pos = self.positions.get(asin)
+            if pos is None:
+                continue
+            decay = 1.0 / (1.0 + idx * 0.1)
+            start, end = self.indptr[pos], self.indptr[pos + 1]
+            for dst, w in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()):
+                scores[dst] += decay * w
+        ranked = heapq.nlargest(
+            top_k,
+            ((score, dst) for dst, score in scores.items() if self.asins[dst] not in seen),
+        )
+        return [(self.asins[dst], round(score, 4)) for score, dst in ranked]
+
+
+async def load_neighbor_inputs(session: AsyncSession) -> Tuple[List[Dict[str, Any]], List[List[str]]]:
+    """Items (with also_buy / also_viewed) and per-user review histories, newest first."""
+    result = await session.execute(select(Item.asin, Item.also_buy, Item.also_viewed))
+    items = [{"asin": asin, "also_buy": also_buy, "also_viewed": also_viewed} for asin, also_buy, also_viewed in result]
+    result = await session.execute(
+        select(Review.reviewerID, Review.asin).order_by(Review.reviewerID, desc(Review.unixReviewTime))
+    )
+    histories: Dict[str, List[str]] = defaultdict(list)
+    for reviewer_id, asin in result:
+        histories[reviewer_id].append(asin)
+    return items, list(histories.values())
+
+
+class NeighborStore:
+    """
+    Loads the offline table written by scripts/build_item_neighbors.py.
+
+    There is no online build: it scans every review ordered by user, which is
+    too heavy for a request path. Until a build exists ensure() returns None
+    and itemcf requests fall back to sequence. indptr.npy is checked every
+    RELOAD_CHECK_SECONDS and the table reloaded when a newer build was
+    published, so refreshing it is a matter of re-running the build script.
+    """
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = directory
+        self.table: Optional[ItemNeighbors] = None
+        self._mtime: Optional[int] = None
+        self._checked_at = float("-inf")
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _directory(self) -> Path:
+        return self.directory or default_table_dir()
+
+    def available(self) -> bool:
+        """Whether an offline build exists."""
+        return (self._directory() / "indptr.npy").exists()
+
+    async def ensure(self) -> Optional[ItemNeighbors]:
+        if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+            return self.table
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+                return self.table
+            self._checked_at = time.monotonic()
+            try:
+                mtime = (self._directory() / "indptr.npy").stat().st_mtime_ns
+            except FileNotFoundError:
+                return self.table
+            if mtime != self._mtime:
+                try:
+                    # Parsing asins.json is O(items): keep it off the event loop
+                    self.table = await asyncio.get_running_loop().run_in_executor(
+                        None, ItemNeighbors.load, self._directory()
+                    )
+                    self._mtime = mtime
+                except (OSError, ValueError) as e:
+                    logger.warning("could not load item neighbors, keeping the previous table: %s", e)
+        return self.table
+
+
+item_neighbors = NeighborStore()
@@ -1,41 +1,274 @@
-from collections import defaultdict
-from typing import Any, Dict
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from app.models.sql_models import Review, Item
+from app.core.config import settings
+from app.core.tracing import span
+from app.models.sql_models import Review
+from app.services.item_index import item_index, leaf_category
+
+FEEDBACK_SUMMARIES = ["Feedback", "Liked", "Disliked", "Saved"]
+# Users whose last served lists are remembered for click attribution
+SERVED_USERS_LIMIT = 100_000
+
+
+def default_checkpoint_path() -> Path:
+    # One file per worker process: workers sharing a data directory must not overwrite each other
+    base = Path(settings.data_dir) if settings.data_dir else Path(__file__).resolve().parents[2] / "data"
+    return base / f"metrics_checkpoint.{os.getpid()}.json"
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Bitset:
+    """Exact distinct-count over item positions (1 bit per catalogue item)."""
+
+    def __init__(self) -> None:
+        self.bits = bytearray()
+        self.count = 0
+
+    def add(self, pos: int) -> None:
+        byte, mask = pos >> 3, 1 << (pos & 7)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits))))
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def positions(self) -> Iterable[int]:
+        return _bit_positions(self.bits)
+
+
+def _bit_positions(bits: bytes) -> Iterable[int]:
+    for byte, value in enumerate(bits):
+        if value:
+            for bit in range(8):
+                if value & (1 << bit):
+                    yield (byte << 3) | bit
+
+
+class MetricsAggregator:
+    """
+    In-memory metrics maintained as feedback and recommendations are written.
+
+    Counters derivable from the DB (items, feedback, distinct reviewed asins)
+    are bootstrapped once with aggregate queries; serving counters
+    (impressions, clicks, diversity, served asins) are restored from a JSON
+    checkpoint written every METRICS_CHECKPOINT_INTERVAL seconds by a
+    background task (start()), serialized in the default executor so the
+    request path never pays for it. snapshot() is O(1).
+
+    Counters are per worker process: with several uvicorn workers each
+    /api/metrics response reflects only the worker that served it.
+    """
+
+    def __init__(self, checkpoint_path: Optional[Path] = None) -> None:
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = settings.metrics_checkpoint_interval
+        self.bootstrapped = False
+        self._lock: Optional[asyncio.Lock] = None
+        self.feedback_count = 0
+        self.reviewed = Bitset()
+        self.served = Bitset()
+        self.impressions = 0
+        self.clicks = 0
+        self.recommendation_lists = 0
+        self.diversity_sum = 0.0
+        self._recent_served: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._checkpointed_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure(self, session: AsyncSession) -> "MetricsAggregator":
+        if self.bootstrapped:
+            return self
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.bootstrapped:
+                with span("metrics.bootstrap"):
+                    await self.bootstrap(session)
+        return self
+
+    async def bootstrap(self, session: AsyncSession) -> None:
+        index = await item_index.ensure(session)
+        result = await session.execute(
+            select(func.count()).select_from(Review).where(Review.summary.in_(FEEDBACK_SUMMARIES))
+        )
+        # Added, not assigned: feedback recorded before bootstrap (possibly still buffered) is kept
+        self.feedback_count += result.scalar() or 0
+        result = await session.execute(select(Review.asin).distinct())
+        for (asin,) in result:
+            pos = index.positions.get(asin)
+            if pos is not None:
+                self.reviewed.add(pos)
+        self.restore()
+        self.bootstrapped = True
+
+    def record_feedback(self, reviewer_id: str, asin: str) -> None:
+        self.feedback_count += 1
+        pos = item_index.positions.get(asin)
+        if pos is not None:
+            self.reviewed.add(pos)
+        served = self._recent_served.get(reviewer_id)
+        if served and asin in served:
+            # A click: feedback on an item we actually showed this user
+            self.clicks += 1
+            served.discard(asin)
+
+    def record_recommendation(self, reviewer_id: str, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        asins = [item["asin"] for item in items]
+        self.impressions += len(asins)
+        self.recommendation_lists += 1
+        categories = set()
+        for asin, item in zip(asins, items):
+            pos = item_index.positions.get(asin)
+            if pos is not None:
+                self.served.add(pos)
+            categories.add(leaf_category((item.get("meta") or {}).get("categories")))
+        self.diversity_sum += len(categories) / len(asins)
+
+        self._recent_served[reviewer_id] = set(asins)
+        self._recent_served.move_to_end(reviewer_id)
+        if len(self._recent_served) > SERVED_USERS_LIMIT:
+            self._recent_served.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total_items = len(item_index)
+        ctr = self.clicks / self.impressions if self.impressions else 0.0
+        coverage = self.reviewed.count / total_items if total_items else 0.0
+        recommendation_coverage = self.served.count / total_items if total_items else 0.0
+        diversity = self.diversity_sum / self.recommendation_lists if self.recommendation_lists else 0.0
+        return {
+            "ctr": round(min(ctr, 1.0), 4),
+            "coverage": round(coverage, 4),
+            "recommendation_coverage": round(recommendation_coverage, 4),
+            "diversity": round(diversity, 4),
+            "feedback_count": self.feedback_count,
+            "impressions": self.impressions,
+            "clicks": self.clicks,
+            "last_recommendations": self.recommendation_lists,
+        }
+
+    def _path(self) -> Path:
+        return self.checkpoint_path or default_checkpoint_path()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._checkpoint_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            # Before bootstrap the restored counters are not merged in yet
+            if not self.bootstrapped:
+                continue
+            try:
+                with span("metrics.checkpoint"):
+                    # Counters are copied on the loop; decoding and writing happen in a thread
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, _write_checkpoint, self._path(), self._state(), item_index.asins
+                    )
+            except Exception as e:
+                print(f"[Metrics] checkpoint failed: {e!r}")
+
+    def checkpoint(self) -> None:
+        """Synchronous checkpoint, for shutdown."""
+        with span("metrics.checkpoint"):
+            _write_checkpoint(self._path(), self._state(), item_index.asins)
+
+    def _state(self) -> Dict[str, Any]:
+        self._checkpointed_at = time.time()
+        return {
+            "saved_at": int(self._checkpointed_at),
+            "impressions": self.impressions,
+            "clicks": self.clicks,
+            "recommendation_lists": self.recommendation_lists,
+            "diversity_sum": self.diversity_sum,
+            "served_bits": bytes(self.served.bits),
+        }
+
+    def _adopt_orphan(self, path: Path) -> None:
+        """Take over the checkpoint of an exited worker (or the old single-file one) by renaming it."""
+        for candidate in sorted(path.parent.glob("metrics_checkpoint*.json")):
+            pid = candidate.stem.rpartition(".")[2]
+            if pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            try:
+                # Atomic: when two workers race for the same file only one rename succeeds
+                os.rename(candidate, path)
+                return
+            except OSError:
+                continue
+
+    def restore(self) -> None:
+        path = self._path()
+        if not path.exists() and self.checkpoint_path is None:
+            self._adopt_orphan(path)
+        if not path.exists():
+            return
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[Metrics] ignoring unreadable checkpoint {path}: {e}")
+            return
+        # Added, not assigned: events recorded before bootstrap are kept
+        self.impressions += state.get("impressions", 0)
+        self.clicks += state.get("clicks", 0)
+        self.recommendation_lists += state.get("recommendation_lists", 0)
+        self.diversity_sum += state.get("diversity_sum", 0.0)
+        for asin in state.get("served_asins", []):
+            pos = item_index.positions.get(asin)
+            if pos is not None:
+                self.served.add(pos)
+
+
+def _write_checkpoint(path: Path, state: Dict[str, Any], asins: List[str]) -> None:
+    state = dict(state)
+    # Positions are not stable across index rebuilds; persist asins
+    state["served_asins"] = [asins[pos] for pos in _bit_positions(state.pop("served_bits")) if pos < len(asins)]
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[Metrics] checkpoint failed: {e}")
+
+
+metrics_aggregator = MetricsAggregator()
+
 
 async def compute_metrics(session: AsyncSession) -> Dict[str, Any]:
-    # Since we don't persist "last_recommendations" and "feedback" in a dedicated way,
-    # we'll compute some general stats from the DB.
-    
-    # Total Items
-    result = await session.execute(select(func.count()).select_from(Item))
-    total_items = result.scalar() or 0
-    
-    # Feedback Count
-    # Count reviews with summary="Feedback" (new system) or "Liked"/"Disliked"/"Saved" (old system)
-    result = await session.execute(
-        select(func.count()).select_from(Review).where(Review.summary.in_(["Feedback", "Liked", "Disliked", "Saved"]))
-    )
-    feedback_count = result.scalar() or 0
-    
-    # CTR: Assume some base impressions? Or just return raw feedback count for now.
-    # Without tracking impressions, CTR is hard to calc.
-    ctr = 0.05 + (feedback_count * 0.01) # Mock CTR that increases with feedback
-    
-    # Coverage: (Distinct items reviewed / Total items)
-    result = await session.execute(select(func.count(func.distinct(Review.asin))).select_from(Review))
-    reviewed_items = result.scalar() or 0
-    coverage = reviewed_items / total_items if total_items else 0.0
-    
-    # Diversity: We can't easily compute diversity of *last recommendation* since we don't store it.
-    # We'll return a static or random value, or compute diversity of *all reviews*.
-    diversity = 0.4 # Placeholder
-    
-    return {
-        "ctr": round(min(ctr, 1.0), 4),
-        "coverage": round(coverage, 4),
-        "diversity": round(diversity, 4),
-        "feedback_count": feedback_count,
-        "last_recommendations": 0, # Not tracked in DB
-    }
+    # Served from in-memory aggregates; the DB is only read once to bootstrap them.
+    aggregator = await metrics_aggregator.ensure(session)
+    with span("metrics.snapshot"):
+        return aggregator.snapshot()
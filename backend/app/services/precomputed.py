@@ -0,0 +1,109 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.sql_models import PrecomputedRec
+from app.services.item_index import item_index
+from app.services.user_context import user_contexts
+
+logger = logging.getLogger(__name__)
+
+# MySQL ER_NO_SUCH_TABLE; SQLite only reports it in the message
+NO_SUCH_TABLE_ERRNO = 1146
+# Backoff after a transient lookup failure, doubling up to the max
+RETRY_INITIAL_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+def _missing_table(error: DBAPIError) -> bool:
+    args = getattr(error.orig, "args", ())
+    return (bool(args) and args[0] == NO_SUCH_TABLE_ERRNO) or "no such table" in str(error.orig).lower()
+
+
+class PrecomputedRecs:
+    """
+    Serves the offline top-K written by scripts/precompute_recs.py.
+
+    A row is used only if it was computed for the same threshold, holds at
+    least top_k items, is younger than PRECOMPUTED_MAX_AGE, and the user has
+    no reviews or pending feedback since the batch started. Everyone else is
+    recomputed online. The check is one primary-key lookup; the latest
+    activity comes from the request's shared UserContext.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = settings.precomputed_max_age > 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.failures = 0
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_INITIAL_SECONDS
+
+    async def lookup(
+        self, session: AsyncSession, reviewer_id: str, mode: str, top_k: int, threshold: int
+    ) -> Optional[Dict[str, Any]]:
+        if not self.enabled or time.monotonic() < self._retry_at:
+            return None
+        try:
+            result = await session.execute(select(PrecomputedRec).where(PrecomputedRec.reviewerID == reviewer_id))
+        except DBAPIError as e:
+            await session.rollback()
+            if _missing_table(e):
+                # Table not migrated yet: stop asking until the next restart
+                self.enabled = False
+                logger.warning("precomputed_recs table missing, precomputed serving disabled: %s", e.orig)
+                return None
+            # Transient (connection reset, lock wait, failover): compute online for a while, then retry
+            self.failures += 1
+            self._retry_at = time.monotonic() + self._retry_delay
+            logger.warning("precomputed lookup failed, retrying in %.0fs: %s", self._retry_delay, e.orig)
+            self._retry_delay = min(self._retry_delay * 2, RETRY_MAX_SECONDS)
+            return None
+        self._retry_delay = RETRY_INITIAL_SECONDS
+        rec = result.scalar_one_or_none()
+        if rec is None:
+            self.misses += 1
+            return None
+        if mode not in ("auto", rec.module) or rec.threshold != threshold or top_k > len(rec.items):
+            self.misses += 1
+            return None
+        # The context history is newest first and already includes unflushed feedback
+        history = (await user_contexts.get(session, reviewer_id)).history
+        last_active = history[0]["unixReviewTime"] if history else None
+        if time.time() - rec.version > settings.precomputed_max_age or (
+            last_active is not None and last_active >= rec.version
+        ):
+            self.stale += 1
+            return None
+
+        index = await item_index.ensure(session)
+        items = []
+        for item in rec.items:
+            meta = index.item(item["asin"])
+            if meta is not None:
+                items.append({**item, "meta": meta})
+        self.hits += 1
+        return {
+            "startup_type": rec.startup_type,
+            "behavior_count": rec.behavior_count,
+            "module": rec.module,
+            "items": items[:top_k],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "failures": self.failures,
+        }
+
+
+precomputed_recs = PrecomputedRecs()
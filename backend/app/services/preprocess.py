@@ -44,3 +44,26 @@ def build_social_neighbors(edges: List[Dict[str, Any]]) -> Dict[str, List[Tuple[
     for edge in edges:
         neighbors[edge["source"]].append((edge["target"], edge["weight"]))
     return neighbors
+
+
+def build_social_csr(
+    edges: List[Dict[str, Any]]
+) -> Tuple[List[str], List[int], List[int], List[float]]:
+    """CSR form of build_social_neighbors: (user_ids, indptr, indices, weights)."""
+    neighbors = build_social_neighbors(edges)
+    user_ids: List[str] = []
+    positions: Dict[str, int] = {}
+    for edge in edges:
+        for node in (edge["source"], edge["target"]):
+            if node not in positions:
+                positions[node] = len(user_ids)
+                user_ids.append(node)
+    indptr = [0]
+    indices: List[int] = []
+    weights: List[float] = []
+    for node in user_ids:
+        for target, weight in neighbors.get(node, []):
+            indices.append(positions[target])
+            weights.append(weight)
+        indptr.append(len(indices))
+    return user_ids, indptr, indices, weights
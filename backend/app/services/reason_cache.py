@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+def reason_fingerprint(module: str, asins: Iterable[str], model: str) -> str:
+    """Normalized key: the same candidate set in any order maps to one entry."""
+    raw = f"{model}|{module}|{','.join(sorted(asins))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One upstream stream in progress; followers replay chunks as they arrive."""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def append(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    async def follow(self) -> AsyncGenerator[str, None]:
+        idx = 0
+        while True:
+            changed = self.changed
+            if idx < len(self.chunks):
+                yield self.chunks[idx]
+                idx += 1
+                continue
+            if self.done:
+                return
+            await changed.wait()
+
+
+class ReasonCache:
+    """
+    TTL + LRU cache of LLM reason streams ("THINK:..." / "TEXT:..." chunks).
+
+    Concurrent requests for the same key share a single upstream call: the
+    first caller starts it in a background task and every caller, including
+    the first, replays the chunks from the shared flight.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        # The loop only keeps weak references to tasks; these keep producers alive until done
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, chunks = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return chunks
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, chunks)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _run(
+        self,
+        key: str,
+        flight: _Flight,
+        produce: Callable[[], AsyncGenerator[str, None]],
+        fallback: str,
+    ) -> None:
+        try:
+            async for chunk in produce():
+                flight.append(chunk)
+            text = "".join(c[5:] for c in flight.chunks if c.startswith("TEXT:"))
+            # Don't pin the rule-based fallback: the next request should retry the LLM
+            if text.strip() and text != fallback:
+                self.put(key, list(flight.chunks))
+        except Exception as e:
+            print(f"[ReasonCache] reason stream failed: {e!r}")
+            # Followers still get a reason
+            if fallback and not any(c.startswith("TEXT:") for c in flight.chunks):
+                flight.append(f"TEXT:{fallback}")
+        finally:
+            flight.finish()
+            self._inflight.pop(key, None)
+
+    async def stream(
+        self,
+        key: str,
+        produce: Callable[[], AsyncGenerator[str, None]],
+        fallback: str = "",
+    ) -> AsyncGenerator[str, None]:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            for chunk in cached:
+                yield chunk
+            return
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = _Flight()
+            self._inflight[key] = flight
+            # Runs independently of this caller so followers finish even if it disconnects
+            task = asyncio.get_running_loop().create_task(self._run(key, flight, produce, fallback))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.joined += 1
+
+        async for chunk in flight.follow():
+            yield chunk
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "inflight": len(self._inflight),
+        }
+
+
+reason_cache = ReasonCache(settings.reason_cache_size, settings.reason_cache_ttl)
@@ -0,0 +1,215 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+
+REDIS_KEY_PREFIX = "uni-rec:recs:"
+
+
+def _field(mode: str, top_k: int, threshold: int) -> str:
+    return f"{mode}:{top_k}:{threshold}"
+
+
+def _copy_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # New top-level and per-item dicts, so callers can set keys (e.g. summary) without
+    # touching the cached entry; nested values such as meta are still shared
+    copied = dict(payload)
+    copied["items"] = [dict(item) for item in payload.get("items", [])]
+    return copied
+
+
+class CacheBackend(ABC):
+    """
+    Storage for cached recommendation payloads.
+
+    Entries are grouped per user so a user's feedback or edge change drops
+    every (mode, top_k, threshold) variant at once.
+    """
+
+    @abstractmethod
+    async def get(self, reviewer_id: str, field: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def set(self, reviewer_id: str, field: str, payload: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, reviewer_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def size(self) -> int:
+        return -1
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU + TTL dict, one per worker."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._fields: Dict[str, set] = {}
+        self.evictions = 0
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        fields = self._fields.get(key[0])
+        if fields is not None:
+            fields.discard(key[1])
+            if not fields:
+                del self._fields[key[0]]
+
+    async def get(self, reviewer_id: str, field: str) -> Optional[Dict[str, Any]]:
+        key = (reviewer_id, field)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return _copy_payload(payload)
+
+    async def set(self, reviewer_id: str, field: str, payload: Dict[str, Any]) -> None:
+        key = (reviewer_id, field)
+        self._entries[key] = (time.monotonic() + self.ttl, _copy_payload(payload))
+        self._entries.move_to_end(key)
+        self._fields.setdefault(reviewer_id, set()).add(field)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def invalidate(self, reviewer_id: str) -> None:
+        for field in list(self._fields.get(reviewer_id, ())):
+            self._drop((reviewer_id, field))
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._fields.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Shared cache across workers: one hash per user, one field per variant.
+
+    Eviction is left to Redis (maxmemory-policy allkeys-lru); the TTL is put
+    on the hash and refreshed on write. Any client exposing the redis.asyncio
+    hget/hset/expire/delete API works, e.g. a local fakeredis instance.
+    """
+
+    def __init__(self, client, ttl: float) -> None:
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> "RedisBackend":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url), ttl)
+
+    async def get(self, reviewer_id: str, field: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.hget(REDIS_KEY_PREFIX + reviewer_id, field)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, reviewer_id: str, field: str, payload: Dict[str, Any]) -> None:
+        key = REDIS_KEY_PREFIX + reviewer_id
+        await self.client.hset(key, field, json.dumps(payload))
+        await self.client.expire(key, max(int(self.ttl), 1))
+
+    async def invalidate(self, reviewer_id: str) -> None:
+        await self.client.delete(REDIS_KEY_PREFIX + reviewer_id)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=REDIS_KEY_PREFIX + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class RecommendationCache:
+    """
+    Computed recommendation payloads keyed by (reviewerID, mode, top_k, threshold).
+
+    Invalidated per user by add_feedback and by social graph rebuilds that
+    change the user's edges. Activity of *other* users (e.g. a neighbor's new
+    reviews feeding social mode) is only picked up once the entry expires.
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def get(self, reviewer_id: str, mode: str, top_k: int, threshold: int) -> Optional[Dict[str, Any]]:
+        try:
+            payload = await self.backend.get(reviewer_id, _field(mode, top_k, threshold))
+        except Exception as e:
+            # A cache outage must not fail the request; recompute instead
+            self.errors += 1
+            print(f"[RecCache] get failed: {e!r}")
+            payload = None
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    async def put(self, reviewer_id: str, mode: str, top_k: int, threshold: int, payload: Dict[str, Any]) -> None:
+        try:
+            await self.backend.set(reviewer_id, _field(mode, top_k, threshold), payload)
+        except Exception as e:
+            self.errors += 1
+            print(f"[RecCache] set failed: {e!r}")
+
+    async def invalidate(self, reviewer_id: str) -> None:
+        self.invalidations += 1
+        try:
+            await self.backend.invalidate(reviewer_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"[RecCache] invalidate failed: {e!r}")
+
+    async def invalidate_many(self, reviewer_ids: Iterable[str]) -> None:
+        for reviewer_id in reviewer_ids:
+            await self.invalidate(reviewer_id)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+def create_backend() -> CacheBackend:
+    if settings.rec_cache_backend == "redis":
+        try:
+            return RedisBackend.from_url(settings.redis_url, settings.rec_cache_ttl)
+        except ImportError:
+            print("[RecCache] redis package not installed, falling back to the in-process cache")
+    return MemoryBackend(settings.rec_cache_size, settings.rec_cache_ttl)
+
+
+recommendation_cache = RecommendationCache(create_backend())
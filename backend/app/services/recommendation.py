@@ -1,153 +1,238 @@
+import asyncio
+import time
 from typing import Any, Dict, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
 
+from app.core.config import settings
 from app.core.llm import generate_reason
-from app.models.sql_models import Review, Item, SocialEdge
+from app.core.sse import DONE_FRAME, batch_chunks, sse_frame
+from app.core.tracing import observe, span
+from app.services.impressions import impression_logger
+from app.services.item_embeddings import item_embeddings
+from app.services.item_index import item_index
+from app.services.item_neighbors import item_neighbors
+from app.services.metrics import metrics_aggregator
+from app.services.precomputed import precomputed_recs
+from app.services.rec_cache import recommendation_cache
+from app.services.reason_cache import reason_cache, reason_fingerprint
+from app.services.scoring import fetch_recent_reviews, sequence_scorer
+from app.services.social_graph import social_graph
+from app.services.user_context import user_contexts
+
+# Social propagation: how many propagated users, and how many of their reviews, to consider
+SOCIAL_NEIGHBOR_LIMIT = 50
+SOCIAL_REVIEWS_PER_NEIGHBOR = 10
+
+MODULE_SUMMARIES = {
+    "sequence": "热启动用户使用序列推荐",
+    "itemcf": "基于物品共现关系的协同过滤推荐",
+    "content": "基于商品文本内容相似度的推荐",
+    "social": "冷启动用户使用社交推荐",
+}
 
-# Preprocess helper functions like build_item_popularity are no longer needed
-# as we will use SQL aggregations directly.
 
 async def get_startup_type(session: AsyncSession, reviewer_id: str, threshold: int) -> Tuple[str, int]:
-    result = await session.execute(
-        select(func.count()).select_from(Review).where(Review.reviewerID == reviewer_id)
-    )
-    count = result.scalar() or 0
+    with span("recommend.startup_type"):
+        ctx = await user_contexts.get(session, reviewer_id)
+    count = ctx.behavior_count
     startup_type = "cold" if count < threshold else "hot"
     return startup_type, count
 
 async def sequence_recommend(session: AsyncSession, reviewer_id: str, top_k: int, use_llm: bool) -> List[Dict[str, Any]]:
-    # 1. Get user's recent history
-    history_result = await session.execute(
-        select(Review.asin).where(Review.reviewerID == reviewer_id).order_by(desc(Review.unixReviewTime)).limit(20)
-    )
-    recent_asins = {row[0] for row in history_result.all()}
-    
-    # 2. Compute category preferences (simplified: most frequent category in history)
-    # Ideally, this should be a complex SQL query, but for simplicity, let's fetch recent items' categories
-    # However, to keep it efficient, we might just fallback to a popularity baseline or simple item-based CF.
-    
-    # Let's implement a simplified logic: 
-    # Recommend popular items that are NOT in user's history
-    # Sort by overall rating average (popularity proxy)
-    
-    stmt = (
-        select(Item)
-        .where(Item.asin.notin_(recent_asins) if recent_asins else True)
-        # In a real system, you'd sort by a computed score. 
-        # Here we just take some items. To make it "personalized", we could filter by preferred category.
-        .limit(top_k * 2) 
-    )
-    
-    result = await session.execute(stmt)
-    candidates = result.scalars().all()
-    
-    # Simple scoring (mock)
-    scored_items = []
-    for item in candidates:
-        score = 0.5 # Default score
-        scored_items.append((item, score))
-        
-    scored_items.sort(key=lambda x: x[1], reverse=True)
-    final_items = scored_items[:top_k]
-    
+    index = await item_index.ensure(session)
+
+    # 1. Get user's recent history (newest first)
+    with span("recommend.history"):
+        recent_asins = (await user_contexts.get(session, reviewer_id)).recent_asins
+
+    # 2. Rank the whole catalogue in memory against the user's category preferences
+    with span("recommend.scoring"):
+        final_items = sequence_scorer.score_batch([recent_asins], top_k)[0]
+    return sequence_items(index, final_items)
+
+def sequence_items(index, ranked: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
     return [
         {
-            "asin": item.asin,
+            "asin": index.asins[pos],
             "score": score,
             "reason": "基于近期行为序列与热门内容推荐",
             "source": "sequence",
-            "meta": {
-                "title": item.title,
-                "categories": item.categories,
-                "imageURL": item.imageURL,
-                "price": item.price
-            },
+            "meta": index.meta(pos),
+        }
+        for pos, score in ranked
+    ]
+
+async def itemcf_recommend(session: AsyncSession, reviewer_id: str, top_k: int, use_llm: bool) -> List[Dict[str, Any]]:
+    index = await item_index.ensure(session)
+    table = await item_neighbors.ensure()
+    if table is None:
+        # No offline build yet
+        return await sequence_recommend(session, reviewer_id, top_k, use_llm)
+
+    with span("recommend.history"):
+        recent_asins = (await user_contexts.get(session, reviewer_id)).recent_asins
+
+    with span("recommend.scoring"):
+        items = itemcf_items(index, table, recent_asins, top_k)
+    if not items:
+        return await sequence_recommend(session, reviewer_id, top_k, use_llm)
+    return items
+
+def itemcf_items(index, table, recent_asins: List[str], top_k: int) -> List[Dict[str, Any]]:
+    # Neighbor lookups only: O(history x N), independent of catalogue size
+    ranked = [(asin, score) for asin, score in table.recommend(recent_asins, top_k * 2) if asin in index]
+    return [
+        {
+            "asin": asin,
+            "score": score,
+            "reason": "基于物品共现关系（一起购买/一起浏览）推荐",
+            "source": "itemcf",
+            "meta": index.item(asin),
         }
-        for item, score in final_items
+        for asin, score in ranked[:top_k]
+    ]
+
+async def content_recommend(session: AsyncSession, reviewer_id: str, top_k: int, use_llm: bool) -> List[Dict[str, Any]]:
+    index = await item_index.ensure(session)
+    embeddings = await item_embeddings.ensure()
+    if embeddings is None:
+        # No offline build yet (scripts/build_item_embeddings.py)
+        return await sequence_recommend(session, reviewer_id, top_k, use_llm)
+
+    with span("recommend.history"):
+        recent_asins = (await user_contexts.get(session, reviewer_id)).recent_asins
+
+    with span("recommend.scoring"):
+        # A full scan of the vector matrix: run it off the event loop
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            None, embeddings.recommend, recent_asins, top_k * 2
+        )
+        items = content_items(index, ranked, top_k)
+    if not items:
+        return await sequence_recommend(session, reviewer_id, top_k, use_llm)
+    return items
+
+def content_items(index, ranked: List[Tuple[str, float]], top_k: int) -> List[Dict[str, Any]]:
+    # Text similarity only, so items nobody has reviewed yet can surface
+    ranked = [(asin, score) for asin, score in ranked if asin in index]
+    return [
+        {
+            "asin": asin,
+            "score": score,
+            "reason": "基于商品标题、描述与特征的内容相似度推荐",
+            "source": "content",
+            "meta": index.item(asin),
+        }
+        for asin, score in ranked[:top_k]
     ]
 
 async def social_recommend(session: AsyncSession, reviewer_id: str, top_k: int, use_llm: bool) -> List[Dict[str, Any]]:
-    # 1. Find neighbors
-    stmt = select(SocialEdge).where(SocialEdge.source == reviewer_id)
-    result = await session.execute(stmt)
-    neighbors = result.scalars().all()
-    
+    index = await item_index.ensure(session)
+    graph = await social_graph.ensure(session)
+
+    # 1. Multi-hop neighbors via personalized PageRank on the in-memory graph
+    with span("recommend.social_neighbors"):
+        neighbors = graph.top_users(reviewer_id, SOCIAL_NEIGHBOR_LIMIT)
     if not neighbors:
         # Fallback to popularity if no neighbors
         return await sequence_recommend(session, reviewer_id, top_k, use_llm)
-        
-    neighbor_ids = [n.target for n in neighbors]
-    neighbor_weights = {n.target: n.weight for n in neighbors}
-    
-    # 2. Find what neighbors reviewed
-    # Select items reviewed by neighbors, ordered by neighbor weight * review rating
-    # This is a bit complex in pure ORM, let's fetch recent reviews from neighbors
-    reviews_stmt = (
-        select(Review, Item)
-        .join(Item, Review.asin == Item.asin)
-        .where(Review.reviewerID.in_(neighbor_ids))
-        .order_by(desc(Review.unixReviewTime))
-        .limit(100)
-    )
-    reviews_result = await session.execute(reviews_stmt)
-    
-    item_scores = {}
-    for review, item in reviews_result:
-        weight = neighbor_weights.get(review.reviewerID, 1.0)
-        score = weight * (review.overall or 3.0)
-        if item.asin not in item_scores:
-            item_scores[item.asin] = {
-                "score": 0,
-                "item": item
-            }
-        item_scores[item.asin]["score"] += score
-        
+
+    neighbor_weights = dict(neighbors)
+
+    # 2. What those neighbors reviewed recently: one grouped query, item data from the index
+    with span("recommend.candidates"):
+        neighbor_reviews = await fetch_recent_reviews(session, list(neighbor_weights), SOCIAL_REVIEWS_PER_NEIGHBOR)
+
+    with span("recommend.scoring"):
+        return social_items(index, neighbor_weights, neighbor_reviews, top_k)
+
+def social_items(
+    index, neighbor_weights: Dict[str, float], neighbor_reviews: Dict[str, List[Tuple[str, float]]], top_k: int
+) -> List[Dict[str, Any]]:
+    # neighbor_reviews may hold other users' neighbors too (batch path); only ours count
+    item_scores: Dict[str, float] = {}
+    for neighbor_id, weight in neighbor_weights.items():
+        for asin, overall in neighbor_reviews.get(neighbor_id, ()):
+            if asin not in index:
+                continue
+            item_scores[asin] = item_scores.get(asin, 0.0) + weight * (overall or 3.0)
+
     # Sort by score
-    sorted_items = sorted(item_scores.values(), key=lambda x: x["score"], reverse=True)[:top_k]
-    
+    sorted_items = sorted(item_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
     return [
         {
-            "asin": x["item"].asin,
-            "score": float(round(x["score"], 4)),
+            "asin": asin,
+            "score": float(round(score, 4)),
             "reason": "基于社交邻居行为与影响力推荐",
             "source": "social",
-            "meta": {
-                "title": x["item"].title,
-                "categories": x["item"].categories,
-                "imageURL": x["item"].imageURL,
-                "price": x["item"].price
-            },
+            "meta": index.item(asin),
         }
-        for x in sorted_items
+        for asin, score in sorted_items
     ]
 
-async def recommend_stream(
+async def compute_recommendations(
     session: AsyncSession,
     reviewer_id: str,
     top_k: int,
     threshold: int,
     mode: str,
     use_llm: bool,
-):
-    """
-    Generator that yields SSE events for recommendation process.
-    """
-    import json
-    
-    # 1. Get base recommendations (fast)
+) -> Dict[str, Any]:
+    """Online path: pick the module from the startup type (or the requested mode) and rank."""
     startup_type, count = await get_startup_type(session, reviewer_id, threshold)
     module = "sequence" if startup_type == "hot" else "social"
-    if mode in ["sequence", "social"]:
+    if mode in ["sequence", "social", "itemcf", "content"]:
         module = mode
-        
-    items = []
+
     if module == "sequence":
         items = await sequence_recommend(session, reviewer_id, top_k, use_llm)
-        summary = "热启动用户使用序列推荐"
+    elif module == "itemcf":
+        items = await itemcf_recommend(session, reviewer_id, top_k, use_llm)
+    elif module == "content":
+        items = await content_recommend(session, reviewer_id, top_k, use_llm)
     else:
         items = await social_recommend(session, reviewer_id, top_k, use_llm)
-        summary = "冷启动用户使用社交推荐"
+    return {
+        "startup_type": startup_type,
+        "behavior_count": count,
+        "module": module,
+        "items": items,
+        "summary": MODULE_SUMMARIES[module],
+    }
+
+async def recommend_stream(
+    session: AsyncSession,
+    reviewer_id: str,
+    top_k: int,
+    threshold: int,
+    mode: str,
+    use_llm: bool,
+):
+    """
+    Generator that yields SSE events for recommendation process.
+
+    Frames are bytes from the configured serializer; LLM tokens are merged
+    into one frame per SSE_FLUSH_INTERVAL_MS, and the final update only
+    carries the fields that changed on every item.
+    """
+    started = time.perf_counter()
+    # 1. Get base recommendations (fast), reusing the last result until the user's data changes
+    with span("recommend.cache"):
+        payload = await recommendation_cache.get(reviewer_id, mode, top_k, threshold)
+    if payload is None:
+        # Offline batch result, unless the user has been active since it was computed
+        with span("recommend.precomputed"):
+            payload = await precomputed_recs.lookup(session, reviewer_id, mode, top_k, threshold)
+        if payload is not None:
+            payload["summary"] = MODULE_SUMMARIES[payload["module"]]
+        else:
+            with span("recommend.compute"):
+                payload = await compute_recommendations(session, reviewer_id, top_k, threshold, mode, use_llm)
+        await recommendation_cache.put(reviewer_id, mode, top_k, threshold, payload)
+    startup_type, count = payload["startup_type"], payload["behavior_count"]
+    module, items, summary = payload["module"], payload["items"], payload["summary"]
+    metrics_aggregator.record_recommendation(reviewer_id, items)
+    impression_logger.record(reviewer_id, module, items)
 
     # Send initial data
     initial_payload = {
@@ -159,79 +244,69 @@ async def recommend_stream(
         "behavior_count": count,
         "status": "calculating" if use_llm else "completed"
     }
-    yield f"data: {json.dumps(initial_payload)}\n\n"
+    frame = sse_frame(initial_payload)
+    observe("recommend.first_frame", time.perf_counter() - started)
+    yield frame
 
     if not use_llm or not items:
-        yield "event: done\ndata: {}\n\n"
+        yield DONE_FRAME
         return
 
     # 2. Stream LLM reasoning
-    # store["last_recommendations"] = items # Store not available anymore, maybe save to DB or cache?
-    
     from app.core.llm import stream_reason
     titles = [item["meta"]["title"] for item in items[:5]]
-    prompt = f"用户:{reviewer_id} 模块:{module} 候选内容:{titles} 请给出推荐理由"
+    # No user identity in the prompt: the reason is cached per candidate set and replayed to other users
+    prompt = f"模块:{module} 候选内容:{titles} 请给出推荐理由"
     fallback = items[0]["reason"] if items else ""
-    
-    full_reason = ""
-    async for chunk in stream_reason(prompt, fallback):
-        # Format: "TYPE:CONTENT"
-        if chunk.startswith("THINK:"):
-            content = chunk[6:]
-            yield f"event: thinking\ndata: {json.dumps({'content': content})}\n\n"
-        elif chunk.startswith("TEXT:"):
-            content = chunk[5:]
-            full_reason += content
-            yield f"event: reasoning\ndata: {json.dumps({'content': content})}\n\n"
-
-    # 3. Send final update with reason
-    updated_items = []
-    for item in items:
-        item["reason"] = full_reason.strip()
-        updated_items.append(item)
-    
-    final_payload = {
-        "items": updated_items,
-        "status": "completed"
-    }
-    yield f"event: update\ndata: {json.dumps(final_payload)}\n\n"
-    yield "event: done\ndata: {}\n\n"
+    cache_key = reason_fingerprint(module, [item["asin"] for item in items[:5]], settings.ark_model)
+
+    reason_parts = []
+    # Wall time of the reasoning phase, including the client reading the frames
+    reasoning_started = time.perf_counter()
+    chunks = reason_cache.stream(cache_key, lambda: stream_reason(prompt, fallback), fallback)
+    async for kind, content in batch_chunks(chunks, settings.sse_flush_interval_ms / 1000.0):
+        # Chunk format upstream: "TYPE:CONTENT"
+        if kind == "THINK":
+            yield sse_frame({"content": content}, "thinking")
+        elif kind == "TEXT":
+            reason_parts.append(content)
+            yield sse_frame({"content": content}, "reasoning")
+    observe("recommend.llm_stream", time.perf_counter() - reasoning_started)
+
+    # 3. Send final update: only the reason changed, and it is the same for every item
+    full_reason = "".join(reason_parts).strip()
+    yield sse_frame({"item_fields": {"reason": full_reason}, "status": "completed"}, "update")
+    yield DONE_FRAME
 
 
 async def get_sequence_events(session: AsyncSession, reviewer_id: str) -> List[Dict[str, Any]]:
-    # Join with Item to get item details, but use outer join in case item was deleted or feedback is standalone
-    # Sort by unixReviewTime descending to show latest first
-    stmt = (
-        select(Review, Item)
-        .outerjoin(Item, Review.asin == Item.asin)
-        .where(Review.reviewerID == reviewer_id)
-        .order_by(desc(Review.unixReviewTime))
-        .limit(20)
-    )
-    result = await session.execute(stmt)
-    
+    # Latest first, from the shared user context; item details come from the in-memory index
+    ctx = await user_contexts.get(session, reviewer_id)
+    index = await item_index.ensure(session)
+
     events = []
-    for review, item in result:
+    for review in ctx.history:
         title = "Unknown Item"
         category = "Unknown"
-        if item:
-            title = item.title
-            categories = item.categories or []
+        meta = index.item(review["asin"])
+        if meta:
+            title = meta["title"]
+            categories = meta["categories"] or []
             category = categories[0][-1] if categories and categories[0] else "Unknown"
-            
+
         # Special handling for feedback-generated reviews
         event_type = "review"
-        if review.summary in ["Liked", "Disliked", "Saved"]:
+        if review["summary"] in ["Liked", "Disliked", "Saved"]:
             event_type = "feedback"
-            
+
         events.append({
-            "asin": review.asin,
-            "overall": review.overall,
-            "unixReviewTime": review.unixReviewTime,
+            "asin": review["asin"],
+            "overall": review["overall"],
+            "unixReviewTime": review["unixReviewTime"],
             "title": title,
             "category": category,
-            "ts": review.unixReviewTime,
-            "summary": review.summary, # Expose summary to frontend to distinguish event types
+            "ts": review["unixReviewTime"],
+            "summary": review["summary"], # Expose summary to frontend to distinguish event types
             "type": event_type
         })
     return events
@@ -240,23 +315,21 @@ async def get_sequence_events(session: AsyncSession, reviewer_id: str) -> List[D
 async def get_social_graph(session: AsyncSession, reviewer_id: str) -> Dict[str, Any]:
     nodes = []
     edges = []
-    
-    stmt = select(SocialEdge).where(SocialEdge.source == reviewer_id)
-    result = await session.execute(stmt)
-    neighbors = result.scalars().all()
-    
+
+    neighbors = (await user_contexts.get(session, reviewer_id)).neighbors
+
     nodes.append({"id": reviewer_id, "name": reviewer_id, "category": 0, "symbolSize": 40})
-    
-    for edge in neighbors:
+
+    for target, weight in neighbors:
         nodes.append(
             {
-                "id": edge.target,
-                "name": edge.target,
+                "id": target,
+                "name": target,
                 "category": 1,
                 "symbolSize": 30,
-                "value": edge.weight,
+                "value": weight,
             }
         )
-        edges.append({"source": reviewer_id, "target": edge.target, "value": edge.weight})
-        
+        edges.append({"source": reviewer_id, "target": target, "value": weight})
+
     return {"nodes": nodes, "edges": edges}
@@ -0,0 +1,170 @@
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import Review
+from app.services.item_index import ItemIndex, item_index
+from app.services.preprocess import compute_category_preferences
+
+HISTORY_LIMIT = 20
+CATEGORY_WEIGHT = 0.8
+POPULARITY_WEIGHT = 0.2
+# Upper bound on how stale popularity in the scorer's NumPy copy may get
+SYNC_INTERVAL_SECONDS = 1.0
+
+
+class SequenceScorer:
+    """
+    Batched NumPy ranking over the whole catalogue.
+
+    A batch of users becomes a (B x C) category-preference matrix P and the
+    catalogue a (C x N) item/category one-hot matrix H, so that
+        scores = 0.8 * P @ H + 0.2 * popularity / max_popularity
+    The top-k per row is selected with argpartition, then only those k are sorted.
+
+    Within one leaf category items differ only by popularity, so the exact
+    top-k can only come from each category's (k + history length) most
+    popular items. H is restricted to that pool, which keeps the product and
+    the argpartition independent of catalogue size.
+    """
+
+    def __init__(self, index: ItemIndex) -> None:
+        self.index = index
+        self._version = -1
+        self._synced_at = 0.0
+        self.category_ids = np.zeros(0, dtype=np.int32)
+        self.popularity = np.zeros(0, dtype=np.float32)
+        self._by_category = np.zeros(0, dtype=np.int64)
+        self._rank_in_category = np.zeros(0, dtype=np.int64)
+        self._pools: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def sync(self) -> None:
+        """Refresh the NumPy views when the index gained items or popularity."""
+        if self._version == self.index.version:
+            return
+        # Popularity moves on every feedback; coalesce those re-sorts
+        if len(self.category_ids) == len(self.index) and time.time() - self._synced_at < SYNC_INTERVAL_SECONDS:
+            return
+        self.category_ids = np.frombuffer(self.index.category_ids, dtype=np.int32).copy()
+        popularity = np.frombuffer(self.index.popularity, dtype=np.int64).astype(np.float32)
+        self.popularity = popularity / max(self.index.max_popularity, 1)
+        # Items grouped by category, most popular first within each group
+        self._by_category = np.lexsort((-self.popularity, self.category_ids))
+        sorted_cats = self.category_ids[self._by_category]
+        starts = np.searchsorted(sorted_cats, sorted_cats, side="left")
+        self._rank_in_category = np.arange(len(sorted_cats)) - starts
+        self._pools = {}
+        self._version = self.index.version
+        self._synced_at = time.time()
+
+    def candidate_pool(self, depth: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of each category's `depth` most popular items and their one-hot matrix."""
+        pool = self._pools.get(depth)
+        if pool is None:
+            positions = self._by_category[self._rank_in_category < depth]
+            onehot = np.zeros((len(self.index.category_names), len(positions)), dtype=np.float32)
+            onehot[self.category_ids[positions], np.arange(len(positions))] = 1.0
+            pool = (positions, onehot)
+            self._pools[depth] = pool
+        return pool
+
+    def preference_matrix(self, histories: Sequence[List[str]]) -> np.ndarray:
+        """histories: per user, asins ordered newest first."""
+        index = self.index
+        prefs = np.zeros((len(histories), len(index.category_names)), dtype=np.float32)
+        for row, recent_asins in enumerate(histories):
+            events = [{"asin": asin} for asin in reversed(recent_asins)]
+            items = {asin: index.item(asin) for asin in recent_asins if asin in index}
+            for name, weight in compute_category_preferences(events, items).items():
+                cid = index.category_lookup.get(name)
+                if cid is not None:
+                    prefs[row, cid] = weight
+        row_max = prefs.max(axis=1, keepdims=True) if prefs.size else prefs
+        np.divide(prefs, row_max, out=prefs, where=row_max > 0)
+        return prefs
+
+    def score_batch(
+        self, histories: Sequence[List[str]], top_k: int
+    ) -> List[List[Tuple[int, float]]]:
+        self.sync()
+        if not histories or len(self.category_ids) == 0:
+            return [[] for _ in histories]
+
+        depth = top_k + max(len(h) for h in histories)
+        positions, onehot = self.candidate_pool(depth)
+        prefs = self.preference_matrix(histories)
+        scores = CATEGORY_WEIGHT * (prefs[:, : onehot.shape[0]] @ onehot)
+        scores += POPULARITY_WEIGHT * self.popularity[positions]
+
+        column = {pos: col for col, pos in enumerate(positions.tolist())}
+        asin_positions = self.index.positions
+        for row, recent_asins in enumerate(histories):
+            seen = [column[p] for p in (asin_positions.get(a) for a in recent_asins) if p in column]
+            if seen:
+                scores[row, seen] = -np.inf
+
+        k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = positions[np.take_along_axis(top, order, axis=1)]
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for pos_row, score_row in zip(top.tolist(), top_scores.tolist()):
+            results.append(
+                [(pos, round(score, 4)) for pos, score in zip(pos_row, score_row) if score != -np.inf]
+            )
+        return results
+
+
+async def fetch_recent_reviews(
+    session: AsyncSession, reviewer_ids: Sequence[str], limit: int = HISTORY_LIMIT
+) -> Dict[str, List[Tuple[str, float]]]:
+    """Recent (asin, overall) pairs, newest first, for many users in a single grouped query."""
+    reviews: Dict[str, List[Tuple[str, float]]] = {rid: [] for rid in reviewer_ids}
+    if not reviewer_ids:
+        return reviews
+    rank = (
+        func.row_number()
+        .over(partition_by=Review.reviewerID, order_by=desc(Review.unixReviewTime))
+        .label("recency_rank")
+    )
+    ranked = (
+        select(Review.reviewerID, Review.asin, Review.overall, rank)
+        .where(Review.reviewerID.in_(list(reviewer_ids)))
+        .subquery()
+    )
+    stmt = (
+        select(ranked.c.reviewerID, ranked.c.asin, ranked.c.overall)
+        .where(ranked.c.recency_rank <= limit)
+        .order_by(ranked.c.reviewerID, ranked.c.recency_rank)
+    )
+    result = await session.execute(stmt)
+    for reviewer_id, asin, overall in result:
+        reviews[reviewer_id].append((asin, overall))
+    return reviews
+
+
+async def fetch_recent_histories(
+    session: AsyncSession, reviewer_ids: Sequence[str], limit: int = HISTORY_LIMIT
+) -> Dict[str, List[str]]:
+    """Recent asins (newest first) for many users in a single grouped query."""
+    reviews = await fetch_recent_reviews(session, reviewer_ids, limit)
+    return {rid: [asin for asin, _ in events] for rid, events in reviews.items()}
+
+
+async def score_users(
+    session: AsyncSession, reviewer_ids: Sequence[str], top_k: int
+) -> Dict[str, List[Tuple[int, float]]]:
+    """Rank the catalogue for a batch of users; returns item positions and scores."""
+    await item_index.ensure(session)
+    histories = await fetch_recent_histories(session, reviewer_ids)
+    ranked = sequence_scorer.score_batch([histories[rid] for rid in reviewer_ids], top_k)
+    return dict(zip(reviewer_ids, ranked))
+
+
+sequence_scorer = SequenceScorer(item_index)
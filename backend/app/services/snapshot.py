@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, Optional
+
+# Chunked snapshot layout:
+#   <dir>/manifest.json        format, version, per-table file/rows/sha256
+#   <dir>/<table>.ndjson       one JSON record per line
+SNAPSHOT_FORMAT = "uni-rec-ndjson"
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+TABLES = ("users", "items", "reviews", "social_edges")
+
+
+class SnapshotWriter:
+    """Append-only writer: rows are encoded and hashed as they arrive, never held in memory."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._files: Dict[str, IO[bytes]] = {}
+        self._hashes: Dict[str, Any] = {}
+        self.counts: Dict[str, int] = {}
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(write_manifest=exc_type is None)
+
+    def _open(self, table: str) -> IO[bytes]:
+        if table not in TABLES:
+            raise ValueError(f"unknown snapshot table: {table}")
+        f = self._files.get(table)
+        if f is None:
+            f = open(self.directory / f"{table}.ndjson", "wb")
+            self._files[table] = f
+            self._hashes[table] = hashlib.sha256()
+            self.counts[table] = 0
+        return f
+
+    def write(self, table: str, rows: Iterable[Dict[str, Any]]) -> int:
+        f = self._open(table)
+        digest = self._hashes[table]
+        written = 0
+        for row in rows:
+            line = (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            f.write(line)
+            digest.update(line)
+            written += 1
+        self.counts[table] += written
+        return written
+
+    def close(self, write_manifest: bool = True) -> None:
+        # Tables that never received rows still get an (empty) file
+        for table in TABLES:
+            self._open(table)
+        for f in self._files.values():
+            f.close()
+        if write_manifest:
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "version": SNAPSHOT_VERSION,
+                "created_at": int(time.time()),
+                "tables": {
+                    table: {
+                        "file": f"{table}.ndjson",
+                        "rows": self.counts[table],
+                        "sha256": self._hashes[table].hexdigest(),
+                    }
+                    for table in TABLES
+                },
+            }
+            (self.directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def is_snapshot_dir(path: Path) -> bool:
+    return Path(path).is_dir() and (Path(path) / MANIFEST_NAME).exists()
+
+
+def read_manifest(directory: Path) -> Dict[str, Any]:
+    manifest = json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"unsupported snapshot format: {manifest.get('format')}")
+    if manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {manifest['version']} is newer than supported {SNAPSHOT_VERSION}")
+    return manifest
+
+
+def verify_snapshot(directory: Path, manifest: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Check every table file's row count and sha256 against the manifest.
+
+    A read-only pass run before loading, so a truncated or corrupt snapshot
+    is rejected before anything is cleared or inserted. Raises ValueError.
+    """
+    manifest = manifest or read_manifest(directory)
+    for table, entry in manifest["tables"].items():
+        digest = hashlib.sha256()
+        rows = 0
+        with open(Path(directory) / entry["file"], "rb") as f:
+            for line in f:
+                digest.update(line)
+                if line.strip():
+                    rows += 1
+        if rows != entry["rows"] or digest.hexdigest() != entry["sha256"]:
+            raise ValueError(
+                f"snapshot table {table} failed verification: {rows} rows, expected {entry['rows']}"
+            )
+
+
+def iter_table(
+    directory: Path, table: str, manifest: Optional[Dict[str, Any]] = None, verify: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield one table's rows.
+
+    With verify=True the row count and sha256 are checked while streaming and a
+    ValueError is raised after the last row if they disagree with the manifest.
+    That is too late for a loader that commits as it goes: run
+    verify_snapshot() first.
+    """
+    manifest = manifest or read_manifest(directory)
+    entry = manifest["tables"].get(table)
+    if entry is None:
+        return
+    digest = hashlib.sha256()
+    rows = 0
+    with open(Path(directory) / entry["file"], "rb") as f:
+        for line in f:
+            if verify:
+                digest.update(line)
+            if not line.strip():
+                continue
+            rows += 1
+            yield json.loads(line)
+    if verify and (rows != entry["rows"] or digest.hexdigest() != entry["sha256"]):
+        raise ValueError(
+            f"snapshot table {table} failed verification: {rows} rows, expected {entry['rows']}"
+        )
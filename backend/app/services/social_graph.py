@@ -0,0 +1,249 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import SocialEdge
+from app.services.preprocess import build_social_csr
+from app.services.rec_cache import recommendation_cache
+from app.services.user_context import user_contexts
+
+# How often the background refresher checks social_edges for changes
+REFRESH_INTERVAL_SECONDS = 60
+RESULT_CACHE_SIZE = 10_000
+
+# Personalized PageRank (forward push) parameters
+PPR_ALPHA = 0.15
+PPR_EPSILON = 1e-4
+PPR_MAX_HOPS = 3
+PPR_MAX_PUSHES = 5_000
+
+
+class SocialGraph:
+    """
+    In-memory CSR adjacency built from social_edges.
+
+    propagate() runs a local forward-push personalized PageRank from one user:
+    only nodes within PPR_MAX_HOPS whose residual exceeds PPR_EPSILON * degree
+    are expanded, so work stays bounded on graphs with millions of edges.
+    Results are cached per user and dropped whenever the edge set changes.
+
+    The graph is built by warmup and refreshed by a background task (start()),
+    never on the request path; the CPU-heavy part of a build runs in the
+    default executor.
+    """
+
+    def __init__(self) -> None:
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.user_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.out_weight = np.zeros(0, dtype=np.float32)
+        self.built = False
+        self.refreshed_at = 0.0
+        self.version = 0
+        self._fingerprint: Tuple[int, int, int] = (0, 0, 0)
+        self._cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def load_edges(self, edges: List[Dict[str, object]]) -> None:
+        self._set_csr(*build_social_csr(edges))
+
+    def _set_csr(self, user_ids: List[str], indptr, indices, weights) -> None:
+        self.user_ids = user_ids
+        self.positions = {uid: pos for pos, uid in enumerate(user_ids)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        rows = np.repeat(np.arange(len(user_ids)), np.diff(self.indptr))
+        self.out_weight = np.bincount(rows, weights=self.weights, minlength=len(user_ids)).astype(np.float32)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Called whenever edges change; every cached propagation is stale."""
+        self.version += 1
+        self._cache.clear()
+
+    def _csr(self) -> Tuple[List[str], Any, Any, Any]:
+        return self.user_ids, self.indptr, self.indices, self.weights
+
+    async def _fingerprint_of(self, session: AsyncSession) -> Tuple[int, int, int]:
+        # Count and max id catch inserts and deletes; edges have no updated-at column, so
+        # weight UPDATEs are caught by an id-weighted checksum (a plain sum misses swaps).
+        # Weights are scaled to integers so the sum is exact whatever order rows are added in.
+        result = await session.execute(
+            select(
+                func.count(),
+                func.max(SocialEdge.id),
+                func.sum(SocialEdge.id * cast(func.round(SocialEdge.weight * 1000000), Integer)),
+            ).select_from(SocialEdge)
+        )
+        count, max_id, checksum = result.one()
+        return int(count or 0), int(max_id or 0), int(checksum or 0)
+
+    async def build(self, session: AsyncSession) -> None:
+        fingerprint = await self._fingerprint_of(session)
+        result = await session.execute(select(SocialEdge.source, SocialEdge.target, SocialEdge.weight))
+        edges = [{"source": s, "target": t, "weight": w or 0.0} for s, t, w in result]
+        previous = self._csr() if self.built else None
+        # CSR construction and the diff walk every edge: keep them off the event loop
+        csr, changed = await asyncio.get_running_loop().run_in_executor(None, _prepare_csr, edges, previous)
+        self._set_csr(*csr)
+        if previous is not None:
+            # Cached contexts and recommendations of users whose own edges changed are stale
+            for reviewer_id in changed:
+                user_contexts.invalidate(reviewer_id)
+            await recommendation_cache.invalidate_many(changed)
+        self._fingerprint = fingerprint
+        self.built = True
+        self.refreshed_at = time.time()
+
+    async def ensure(self, session: AsyncSession) -> "SocialGraph":
+        """Builds the graph if warmup has not yet; refreshing is left to the background task."""
+        if self.built:
+            return self
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.built:
+                await self.build(session)
+        return self
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Rebuild if social_edges changed since the last build."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.built or await self._fingerprint_of(session) != self._fingerprint:
+                await self.build(session)
+            self.refreshed_at = time.time()
+
+    def start(self) -> None:
+        if self._refresher is None:
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresher is None:
+            return
+        self._refresher.cancel()
+        try:
+            await self._refresher
+        except asyncio.CancelledError:
+            pass
+        self._refresher = None
+
+    async def _refresh_loop(self) -> None:
+        from app.services.data_store import read_session_factory
+
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL_SECONDS)
+            try:
+                async with read_session_factory() as session:
+                    await self.refresh(session)
+            except Exception as e:
+                print(f"[SocialGraph] refresh failed: {e!r}")
+
+    def neighbors(self, reviewer_id: str) -> List[Tuple[str, float]]:
+        pos = self.positions.get(reviewer_id)
+        if pos is None:
+            return []
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return [
+            (self.user_ids[dst], float(w))
+            for dst, w in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist())
+        ]
+
+    def propagate(self, reviewer_id: str) -> Dict[str, float]:
+        """Personalized PageRank scores of other users, seeded at reviewer_id."""
+        cached = self._cache.get(reviewer_id)
+        if cached is not None:
+            self._cache.move_to_end(reviewer_id)
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        scores = self._push(reviewer_id)
+        self._cache[reviewer_id] = scores
+        if len(self._cache) > RESULT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return scores
+
+    def _push(self, reviewer_id: str) -> Dict[str, float]:
+        source = self.positions.get(reviewer_id)
+        if source is None:
+            return {}
+        estimate: Dict[int, float] = defaultdict(float)
+        residual: Dict[int, float] = {source: 1.0}
+        hops = {source: 0}
+        queue = [source]
+        pushes = 0
+        while queue and pushes < PPR_MAX_PUSHES:
+            node = queue.pop()
+            mass = residual.pop(node, 0.0)
+            if mass <= 0.0:
+                continue
+            pushes += 1
+            estimate[node] += PPR_ALPHA * mass
+            start, end = self.indptr[node], self.indptr[node + 1]
+            total = float(self.out_weight[node])
+            if start == end or total <= 0.0 or hops[node] >= PPR_MAX_HOPS:
+                continue
+            spread = (1.0 - PPR_ALPHA) * mass / total
+            for dst, w in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()):
+                before = residual.get(dst, 0.0)
+                after = before + spread * w
+                residual[dst] = after
+                if dst not in hops:
+                    hops[dst] = hops[node] + 1
+                degree = max(int(self.indptr[dst + 1] - self.indptr[dst]), 1)
+                # Early termination: only expand nodes whose residual is still significant
+                if before < PPR_EPSILON * degree <= after:
+                    queue.append(dst)
+        # Mass left in unexpanded nodes (below the threshold, past the hop or push
+        # limit) still counts, so weakly reached direct neighbors are not dropped
+        for node, mass in residual.items():
+            estimate[node] += PPR_ALPHA * mass
+        estimate.pop(source, None)
+        return {self.user_ids[pos]: score for pos, score in estimate.items()}
+
+    def top_users(self, reviewer_id: str, limit: int) -> List[Tuple[str, float]]:
+        scores = self.propagate(reviewer_id)
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+
+social_graph = SocialGraph()
+
+
+def _adjacency(user_ids: List[str], indptr, indices, weights) -> Dict[str, List[Tuple[str, float]]]:
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int32)
+    # Same precision as the stored graph, so an unchanged row compares equal
+    weights = np.asarray(weights, dtype=np.float32)
+    rows = {}
+    for pos, uid in enumerate(user_ids):
+        start, end = indptr[pos], indptr[pos + 1]
+        # Sorted: edge order within a row depends on the scan order of social_edges
+        rows[uid] = sorted(zip((user_ids[dst] for dst in indices[start:end].tolist()), weights[start:end].tolist()))
+    return rows
+
+
+def _prepare_csr(edges: List[Dict[str, object]], previous: Optional[Tuple]) -> Tuple[Tuple, List[str]]:
+    """New CSR arrays, plus the users whose outgoing edges differ from `previous`."""
+    csr = build_social_csr(edges)
+    if previous is None:
+        return csr, []
+    before, after = _adjacency(*previous), _adjacency(*csr)
+    changed = [uid for uid in before.keys() | after.keys() if before.get(uid) != after.get(uid)]
+    return csr, changed
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, String, cast, desc, func, literal, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import Review, SocialEdge, User
+from app.services.feedback_buffer import feedback_buffer
+from app.services.scoring import HISTORY_LIMIT
+
+# Sibling calls (/recommend, then /sequence and /social-graph) land within this window
+CONTEXT_TTL_SECONDS = 5.0
+CONTEXT_MEMO_SIZE = 10_000
+
+
+@dataclass
+class UserContext:
+    """Everything the per-user endpoints read about one user."""
+
+    reviewer_id: str
+    profile: Optional[Dict[str, Any]]
+    behavior_count: int = 0
+    # Newest first: {"asin", "overall", "unixReviewTime", "summary"}
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    # Outgoing social_edges as (target, weight)
+    neighbors: List[Tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def exists(self) -> bool:
+        return self.profile is not None
+
+    @property
+    def recent_asins(self) -> List[str]:
+        return [event["asin"] for event in self.history]
+
+
+def _context_query(reviewer_id: str):
+    # One UNION ALL over (kind, key, num, ts, text) so the profile, the
+    # behavior count, the recent history and the edges cost one round-trip.
+    history = (
+        select(Review.asin, Review.overall, Review.unixReviewTime, Review.summary)
+        .where(Review.reviewerID == reviewer_id)
+        .order_by(desc(Review.unixReviewTime))
+        .limit(HISTORY_LIMIT)
+        .subquery()
+    )
+    return union_all(
+        select(
+            literal("profile").label("kind"),
+            User.reviewerName.label("key"),
+            cast(null(), Float).label("num"),
+            cast(null(), Integer).label("ts"),
+            cast(User.meta, String).label("text"),
+        ).where(User.reviewerID == reviewer_id),
+        select(literal("count"), cast(null(), String), cast(func.count(), Float), cast(null(), Integer), cast(null(), String))
+        .select_from(Review)
+        .where(Review.reviewerID == reviewer_id),
+        select(literal("history"), history.c.asin, history.c.overall, history.c.unixReviewTime, cast(history.c.summary, String)),
+        select(literal("edge"), SocialEdge.target, SocialEdge.weight, cast(null(), Integer), SocialEdge.type)
+        .where(SocialEdge.source == reviewer_id),
+    )
+
+
+async def load_user_context(session: AsyncSession, reviewer_id: str) -> UserContext:
+    result = await session.execute(_context_query(reviewer_id))
+    ctx = UserContext(reviewer_id=reviewer_id, profile=None)
+    for kind, key, num, ts, text in result:
+        if kind == "profile":
+            meta = json.loads(text) if isinstance(text, str) else text
+            ctx.profile = {"reviewerName": key or "", "meta": meta or {}}
+        elif kind == "count":
+            ctx.behavior_count = int(num or 0)
+        elif kind == "history":
+            ctx.history.append({"asin": key, "overall": num, "unixReviewTime": ts, "summary": text})
+        else:
+            ctx.neighbors.append((key, float(num or 0.0)))
+    ctx.history.sort(key=lambda e: e["unixReviewTime"] or 0, reverse=True)
+
+    # Feedback still waiting in the write-behind buffer counts as behavior too
+    pending = feedback_buffer.pending_events(reviewer_id)
+    if pending:
+        ctx.behavior_count += len(pending)
+        pending_asins = {row["asin"] for row in pending}
+        events = [
+            {key: row[key] for key in ("asin", "overall", "unixReviewTime", "summary")} for row in pending
+        ]
+        ctx.history = (events + [e for e in ctx.history if e["asin"] not in pending_asins])[:HISTORY_LIMIT]
+    return ctx
+
+
+class _LoaderCancelled(Exception):
+    """Set on a shared load whose first caller was cancelled; joiners load again themselves."""
+
+
+class UserContextMemo:
+    """
+    Short-lived memo of loaded UserContexts.
+
+    Within one request every helper reads the same context, and the sibling
+    requests the frontend fires right after /recommend reuse it as long as
+    it is younger than CONTEXT_TTL_SECONDS. Concurrent loads of one user
+    share a single query. Feedback and edge changes invalidate the user.
+    """
+
+    def __init__(self, ttl: float = CONTEXT_TTL_SECONDS, max_entries: int = CONTEXT_MEMO_SIZE) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, UserContext]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Per user with a load in flight: bumped on invalidation so that load is not stored
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, session: AsyncSession, reviewer_id: str) -> UserContext:
+        entry = self._entries.get(reviewer_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(reviewer_id)
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(reviewer_id)
+        if inflight is not None:
+            self.hits += 1
+            try:
+                # Shielded: a joiner being cancelled must not cancel the shared load
+                return await asyncio.shield(inflight)
+            except _LoaderCancelled:
+                # The loader's client went away; load again on this request's own session
+                return await self.get(session, reviewer_id)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception retrieved even if nobody joined this load
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[reviewer_id] = future
+        self._generations[reviewer_id] = 0
+        try:
+            ctx = await load_user_context(session, reviewer_id)
+        except asyncio.CancelledError:
+            # The load ran on the cancelled request's session; joiners retry with theirs
+            future.set_exception(_LoaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(reviewer_id, None)
+            generation = self._generations.pop(reviewer_id, 0)
+        future.set_result(ctx)
+        if generation == 0:
+            self._entries[reviewer_id] = (time.monotonic(), ctx)
+            self._entries.move_to_end(reviewer_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ctx
+
+    def invalidate(self, reviewer_id: str) -> None:
+        if reviewer_id in self._generations:
+            self._generations[reviewer_id] += 1
+        self._entries.pop(reviewer_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_contexts = UserContextMemo()
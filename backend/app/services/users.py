@@ -0,0 +1,53 @@
+import json
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql_models import User
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Rows fetched per round-trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+
+def _users_query(prefix: Optional[str]):
+    # Plain columns instead of ORM objects: nothing is tracked in the identity map
+    stmt = select(User.reviewerID, User.reviewerName, User.meta).order_by(User.reviewerID)
+    if prefix:
+        stmt = stmt.where(User.reviewerID.startswith(prefix, autoescape=True))
+    return stmt
+
+
+def _user_row(reviewer_id: str, name: Optional[str], meta: Optional[dict]) -> Dict[str, Any]:
+    return {"reviewerID": reviewer_id, "reviewerName": name or "", "meta": meta or {}}
+
+
+async def list_users(
+    session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, prefix: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page ordered by reviewerID, plus the cursor of the next page (None at the end).
+
+    Keyset pagination: the cursor is the last reviewerID returned, so every
+    page is an index range scan on the primary key regardless of depth.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = _users_query(prefix)
+    if cursor:
+        stmt = stmt.where(User.reviewerID > cursor)
+    # One extra row tells whether another page exists
+    result = await session.execute(stmt.limit(limit + 1))
+    rows = result.all()
+    users = [_user_row(*row) for row in rows[:limit]]
+    next_cursor = users[-1]["reviewerID"] if len(rows) > limit else None
+    return users, next_cursor
+
+
+async def stream_users(session_factory, prefix: Optional[str] = None) -> AsyncGenerator[str, None]:
+    """Every (matching) user as NDJSON from a server-side cursor; memory stays flat."""
+    async with session_factory() as session:
+        result = await session.stream(_users_query(prefix).execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for reviewer_id, name, meta in result:
+            yield json.dumps(_user_row(reviewer_id, name, meta), ensure_ascii=False) + "\n"
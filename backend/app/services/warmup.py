@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.tracing import span
+from app.services.data_store import read_session_factory, warm_up_pools
+from app.services.item_embeddings import item_embeddings
+from app.services.item_index import item_index
+from app.services.item_neighbors import item_neighbors
+from app.services.metrics import metrics_aggregator
+from app.services.scoring import sequence_scorer
+from app.services.social_graph import social_graph
+
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class Warmup:
+    """
+    Opens the connection pools and builds the in-memory indexes before the
+    worker reports ready, so the first requests after a deploy do not pay
+    for them. Failures are retried in the background with backoff.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self, name: str, awaitable) -> Any:
+        t0 = time.perf_counter()
+        with span(f"warmup.{name}"):
+            result = await awaitable
+        self.steps[name] = round(time.perf_counter() - t0, 3)
+        return result
+
+    async def run_once(self) -> None:
+        await self._step("pools", warm_up_pools(settings.db_pool_warmup))
+        async with read_session_factory() as session:
+            await self._step("item_index", item_index.ensure(session))
+            sequence_scorer.sync()
+            # Offline builds only; without them itemcf / content requests fall back to sequence
+            if item_neighbors.available():
+                await self._step("item_neighbors", item_neighbors.ensure())
+            if item_embeddings.available():
+                await self._step("item_embeddings", item_embeddings.ensure())
+            await self._step("social_graph", social_graph.ensure(session))
+            await self._step("metrics", metrics_aggregator.ensure(session))
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            self.attempts += 1
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.error = repr(e)
+                print(f"[Warmup] failed, retrying in {delay:.1f}s: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+                continue
+            self.error = None
+            self.seconds = round(time.monotonic() - self.started_at, 3)
+            self.ready = True
+            print(f"[Warmup] ready in {self.seconds:.2f}s: {self.steps}")
+            return
+
+    async def start(self, timeout: float) -> None:
+        """Warm up, waiting at most `timeout` seconds; the rest continues in the background."""
+        if self._task is not None:
+            return
+        self.started_at = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"[Warmup] not done after {timeout:g}s, serving while it continues")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "seconds": self.seconds,
+            "steps": self.steps,
+            "error": self.error,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+from app.services.data_generator import generate_data_chunks
+from app.services.item_embeddings import VECTOR_DIM, ItemEmbeddings, build_item_vectors
+
+PERCENTILES = (50, 95, 99)
+
+
+def generated_items(items: int, seed: int):
+    # Only the items table is needed; stop before the generator samples reviews
+    for table, rows in generate_data_chunks(users=1, items=items, behaviors_per_user=1, social_degree=1, seed=seed):
+        if table == "items":
+            yield from rows
+        elif table in ("reviews", "social_edges"):
+            return
+
+
+def latency_stats(samples) -> dict:
+    ms = np.asarray(samples) * 1000.0
+    stats = {"mean_ms": round(float(ms.mean()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        stats[f"p{p}_ms"] = round(float(value), 3)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build time and query latency of the content vectors")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=VECTOR_DIM)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=200, help="Users per recommend_batch call")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", type=Path, default=None, help="Where vectors.npy is written (default: a temp dir)")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    directory = args.dir or Path(tempfile.mkdtemp(prefix="uni-rec-content-"))
+    t0 = time.perf_counter()
+    build_item_vectors(generated_items(args.items, args.seed), directory, dim=args.dim)
+    build_seconds = time.perf_counter() - t0
+    size_mb = (directory / ItemEmbeddings.FILE).stat().st_size / 2**20
+    print(f"[Bench] Built {args.items} x {args.dim} vectors in {build_seconds:.1f}s ({size_mb:.0f} MB) at {directory}")
+
+    t0 = time.perf_counter()
+    embeddings = ItemEmbeddings.load(directory)
+    load_seconds = time.perf_counter() - t0
+    rng = random.Random(args.seed)
+    histories = [rng.sample(embeddings.asins, args.history) for _ in range(args.queries)]
+
+    # The first query pages the matrix in; report it apart from the warm ones
+    t0 = time.perf_counter()
+    embeddings.recommend(histories[0], args.top_k)
+    cold_query = time.perf_counter() - t0
+    samples = []
+    for history in histories:
+        t0 = time.perf_counter()
+        embeddings.recommend(history, args.top_k)
+        samples.append(time.perf_counter() - t0)
+    single = latency_stats(samples)
+    print(f"[Bench] Single-user query: cold {cold_query * 1000:.1f}ms, warm {single}")
+
+    t0 = time.perf_counter()
+    for start in range(0, len(histories), args.batch):
+        embeddings.recommend_batch(histories[start : start + args.batch], args.top_k)
+    batch_rate = len(histories) / (time.perf_counter() - t0)
+    print(f"[Bench] Batched queries ({args.batch} users per call): {batch_rate:.0f} users/s")
+
+    report = {
+        "params": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "build_seconds": round(build_seconds, 2),
+        "build_items_per_second": round(args.items / build_seconds),
+        "vectors_mb": round(size_mb, 1),
+        "load_seconds": round(load_seconds, 3),
+        "cold_query_ms": round(cold_query * 1000, 3),
+        "query": single,
+        "batch_users_per_second": round(batch_rate, 1),
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"[Bench] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+ENDPOINTS = ("recommend", "sequence", "social_graph", "feedback", "metrics")
+PERCENTILES = (50, 95, 99)
+
+
+# --- Stand-ins -------------------------------------------------------------
+
+class FakeArk:
+    """
+    Ark client stand-in with the shape app.core.llm parses.
+
+    The stream sleeps first_token_ms, then token_latency_ms per token on the
+    calling (LLM pool) thread, like the blocking SDK does.
+    """
+
+    def __init__(self, first_token_ms: float, token_latency_ms: float, think_tokens: int, answer_tokens: int) -> None:
+        self.first_token = first_token_ms / 1000.0
+        self.token_latency = token_latency_ms / 1000.0
+        self.think_tokens = think_tokens
+        self.answer_tokens = answer_tokens
+        self.responses = SimpleNamespace(create=self._create)
+
+    @staticmethod
+    def _chunk(kind: str, text: str) -> SimpleNamespace:
+        if kind == "reasoning":
+            return SimpleNamespace(output=[SimpleNamespace(type="reasoning", summary=[SimpleNamespace(text=text)])])
+        return SimpleNamespace(
+            output=[SimpleNamespace(type="message", role="assistant", content=[SimpleNamespace(text=text)])]
+        )
+
+    def _stream(self):
+        time.sleep(self.first_token)
+        for i in range(self.think_tokens):
+            if i:
+                time.sleep(self.token_latency)
+            yield self._chunk("reasoning", "思考")
+        for i in range(self.answer_tokens):
+            time.sleep(self.token_latency)
+            yield self._chunk("message", "推荐")
+
+    def _create(self, model: str, input: List[Dict[str, str]], stream: bool = False, **kwargs: Any):
+        if stream:
+            return self._stream()
+        time.sleep(self.first_token + self.token_latency * (self.think_tokens + self.answer_tokens))
+        return self._chunk("message", "推荐" * self.answer_tokens)
+
+
+async def seed_database(db_path: Path, args: argparse.Namespace) -> None:
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.models.sql_models import Base
+    from app.services.data_generator import generate_data_chunks
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    counts: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for table, rows in generate_data_chunks(
+            users=args.users,
+            items=args.items,
+            behaviors_per_user=args.behaviors_per_user,
+            social_degree=args.social_degree,
+            seed=args.seed,
+        ):
+            await conn.execute(insert(Base.metadata.tables[table]), rows)
+            counts[table] = counts.get(table, 0) + len(rows)
+    await engine.dispose()
+    print(f"[Bench] Seeded {db_path} in {time.perf_counter() - t0:.1f}s: {counts}")
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Server side: the real app on the SQLite stand-in with the fake Ark client."""
+    # Settings are read at import time
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    os.environ.setdefault("ARK_API_KEY", "bench")
+    import uvicorn
+
+    from app.core import llm
+    from app.main import app
+
+    fake = FakeArk(args.first_token_ms, args.token_latency_ms, args.think_tokens, args.answer_tokens)
+    llm._get_client = lambda: fake
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# --- Load generator --------------------------------------------------------
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+        self.ttfe: List[float] = []
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        if ok:
+            self.latencies[endpoint].append(seconds)
+        else:
+            self.errors[endpoint] += 1
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000.0
+    stats = {"count": int(ms.size), "mean_ms": round(float(ms.mean()), 2), "max_ms": round(float(ms.max()), 2)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        stats[f"p{p}_ms"] = round(float(value), 2)
+    return stats
+
+
+async def timed_get(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, url: str) -> None:
+    t0 = time.perf_counter()
+    try:
+        ok = (await client.get(url)).status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - t0, ok)
+
+
+async def recommend(
+    client: httpx.AsyncClient, recorder: Recorder, user_id: str, args: argparse.Namespace
+) -> List[str]:
+    """POST /recommend and read the SSE stream to the done event; returns the recommended asins."""
+    body = {"reviewerID": user_id, "top_k": args.top_k, "use_llm": not args.no_llm}
+    asins: List[str] = []
+    first_event: Optional[float] = None
+    done = False
+    t0 = time.perf_counter()
+    try:
+        async with client.stream("POST", "/api/recommend", json=body) as response:
+            if response.status_code == 200:
+                async for line in response.aiter_lines():
+                    if first_event is None and line.startswith("data:"):
+                        first_event = time.perf_counter() - t0
+                        # The unnamed first event carries the items
+                        asins = [item["asin"] for item in json.loads(line[5:]).get("items", [])]
+                    elif line == "event: done":
+                        done = True
+    except httpx.HTTPError:
+        done = False
+    recorder.record("recommend", time.perf_counter() - t0, done)
+    if done and first_event is not None:
+        recorder.ttfe.append(first_event)
+    return asins
+
+
+async def virtual_user(
+    client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, deadline: float, args: argparse.Namespace
+) -> None:
+    """One session after another: recommend, then the sibling calls the frontend makes, then feedback."""
+    iteration = 0
+    while time.perf_counter() < deadline:
+        user_id = f"A{rng.randrange(args.users):09d}"
+        asins = await recommend(client, recorder, user_id, args)
+        await timed_get(client, recorder, "sequence", f"/api/users/{user_id}/sequence")
+        await timed_get(client, recorder, "social_graph", f"/api/users/{user_id}/social-graph")
+
+        asin = rng.choice(asins) if asins else f"B{rng.randrange(args.items):09d}"
+        t0 = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/feedback", json={"reviewerID": user_id, "asin": asin, "score": rng.randint(1, 5)}
+            )
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        recorder.record("feedback", time.perf_counter() - t0, ok)
+
+        iteration += 1
+        if args.metrics_every and iteration % args.metrics_every == 0:
+            await timed_get(client, recorder, "metrics", "/api/metrics")
+
+
+async def run_level(base_url: str, concurrency: int, args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, recorder, random.Random(args.seed * 100_003 + i), deadline, args)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - t0
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        stats = summarize(recorder.latencies[name])
+        stats["errors"] = recorder.errors[name]
+        stats["throughput_rps"] = round(stats["count"] / elapsed, 2)
+        endpoints[name] = stats
+    total = sum(stats["count"] for stats in endpoints.values())
+    errors = sum(recorder.errors.values())
+    print(
+        f"[Bench] concurrency={concurrency}: {total} requests in {elapsed:.1f}s "
+        f"({total / elapsed:.1f} req/s, {errors} errors), recommend p95="
+        f"{endpoints['recommend'].get('p95_ms', 0)}ms"
+    )
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "time_to_first_event": summarize(recorder.ttfe),
+        "endpoints": endpoints,
+    }
+
+
+async def warm_up(base_url: str, args: argparse.Namespace) -> None:
+    # One pass over the request path so lazily created state stays out of the numbers
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        await recommend(client, Recorder(), f"A{0:09d}", args)
+        await client.get("/api/metrics")
+
+
+async def server_stats(base_url: str) -> Dict[str, Any]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        return {
+            "cache": (await client.get("/api/cache/stats")).json(),
+            "db": (await client.get("/api/db/stats")).json(),
+        }
+
+
+def wait_for_server(base_url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/ready", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load test /api/recommend (SSE), /sequence, /social-graph, /feedback and /metrics "
+        "against a SQLite stand-in with a fake LLM"
+    )
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--items", type=int, default=5_000)
+    parser.add_argument("--behaviors-per-user", type=int, default=20)
+    parser.add_argument("--social-degree", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", type=Path, default=None, help="SQLite file; seeded unless it already exists")
+    parser.add_argument("--reseed", action="store_true", help="Rebuild --db even if it exists")
+    parser.add_argument("--concurrency", default="100,500,1000", help="Comma-separated virtual user counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--metrics-every", type=int, default=10, help="Call /metrics every N sessions (0: never)")
+    parser.add_argument("--no-llm", action="store_true", help="Send use_llm=false")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--think-tokens", type=int, default=20)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON report here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    if args.db is None:
+        args.db = Path(tempfile.gettempdir()) / f"uni-rec-bench-{args.users}-{args.items}-{args.seed}.db"
+    if args.reseed and args.db.exists():
+        args.db.unlink()
+    if not args.db.exists():
+        asyncio.run(seed_database(args.db, args))
+    else:
+        print(f"[Bench] Reusing {args.db}")
+
+    # The server runs in its own process so the load generator does not share its event loop
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--serve", "--db", str(args.db), "--port", str(port),
+        "--first-token-ms", str(args.first_token_ms), "--token-latency-ms", str(args.token_latency_ms),
+        "--think-tokens", str(args.think_tokens), "--answer-tokens", str(args.answer_tokens),
+    ]
+    server = subprocess.Popen(command, cwd=BASE_DIR)
+    try:
+        wait_for_server(base_url, server)
+        asyncio.run(warm_up(base_url, args))
+        levels = [
+            asyncio.run(run_level(base_url, int(level), args))
+            for level in args.concurrency.split(",") if level.strip()
+        ]
+        stats = asyncio.run(server_stats(base_url))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("serve", "port", "output")}
+    params["db"] = str(args.db)
+    report = {
+        "commit": git_commit(),
+        "created_at": int(time.time()),
+        "params": params,
+        "levels": levels,
+        "server": stats,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"[Bench] Wrote {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
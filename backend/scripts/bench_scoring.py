@@ -0,0 +1,77 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+from app.services.item_index import ItemIndex
+from app.services.preprocess import compute_category_preferences
+from app.services.scoring import SequenceScorer
+
+
+def build_index(items: int, categories: int, seed: int) -> ItemIndex:
+    rng = random.Random(seed)
+    index = ItemIndex()
+    for i in range(items):
+        leaf = f"Category{rng.randrange(categories)}"
+        index.add_item(f"B{i:09d}", f"Item {i}", rng.uniform(19, 4999), [["Electronics", leaf]], None)
+    for asin in index.asins:
+        index.record_review(asin, int(rng.paretovariate(1.2)))
+    index.built = True
+    return index
+
+
+def python_loop(index: ItemIndex, histories, top_k: int):
+    # The per-item loop the scorer replaces: preferences, then ItemIndex.score
+    results = []
+    for recent_asins in histories:
+        events = [{"asin": asin} for asin in reversed(recent_asins)]
+        items = {asin: index.item(asin) for asin in recent_asins}
+        preferences = compute_category_preferences(events, items)
+        results.append(index.score(preferences, set(recent_asins), top_k))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the NumPy scorer with the per-item Python loop")
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    index = build_index(args.items, args.categories, args.seed)
+    print(f"[Bench] Built index with {len(index)} items in {time.perf_counter() - t0:.2f}s")
+    histories = [rng.sample(index.asins, 20) for _ in range(args.users)]
+
+    scorer = SequenceScorer(index)
+    scorer.sync()
+
+    # The Python loop is slow at catalogue scale, so it only runs on a sample
+    loop_users = histories[: max(1, min(len(histories), 50))]
+    t0 = time.perf_counter()
+    python_loop(index, loop_users, args.top_k)
+    loop_elapsed = time.perf_counter() - t0
+    loop_rate = len(loop_users) / loop_elapsed
+
+    t0 = time.perf_counter()
+    for i in range(0, len(histories), args.batch):
+        scorer.score_batch(histories[i : i + args.batch], args.top_k)
+    numpy_elapsed = time.perf_counter() - t0
+    numpy_rate = len(histories) / numpy_elapsed
+
+    print(f"[Bench] Python loop : {loop_rate:10.1f} users/s ({len(loop_users)} users)")
+    print(f"[Bench] NumPy batch : {numpy_rate:10.1f} users/s ({len(histories)} users, batch={args.batch})")
+    print(f"[Bench] Speedup     : {numpy_rate / loop_rate:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+# Load .env
+load_dotenv(BASE_DIR / ".env")
+
+from app.services.item_embeddings import (
+    VECTOR_DIM,
+    ItemEmbeddings,
+    build_item_vectors,
+    default_embedding_dir,
+    load_embedding_inputs,
+)
+
+async def build_item_embeddings(dim: int = VECTOR_DIM):
+    mysql_user = os.getenv("MYSQL_USER", "root")
+    mysql_password = os.getenv("MYSQL_PASSWORD", "")
+    mysql_host = os.getenv("MYSQL_HOST", "127.0.0.1")
+    mysql_port = os.getenv("MYSQL_PORT", "3306")
+    mysql_db = os.getenv("MYSQL_DB", "uni_rec")
+
+    if not mysql_password:
+        print("[Error] Please set MYSQL_PASSWORD in .env")
+        return
+
+    db_url = f"mysql+aiomysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_db}"
+    print(f"[MySQL] Connecting to {db_url.replace(mysql_password, '******')}...")
+
+    engine = create_async_engine(db_url, echo=False)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    try:
+        start = time.perf_counter()
+        async with async_session() as session:
+            print("[Data] Loading item titles, brands, features and descriptions...")
+            items = await load_embedding_inputs(session)
+
+        directory = default_embedding_dir()
+        staging = directory.with_name(f"{directory.name}.staging")
+        print(f"[Build] Projecting {len(items)} items to {dim} dimensions...")
+        # Built next to the live files, then renamed over them: running workers reload it within a minute
+        embeddings = build_item_vectors(items, staging, dim=dim)
+        ItemEmbeddings.publish(staging, directory)
+        print(f"[Success] Wrote {len(embeddings)} x {embeddings.dim} vectors to {directory} in {time.perf_counter() - start:.1f}s")
+        await engine.dispose()
+
+    except Exception as e:
+        print(f"[Error] Build failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else VECTOR_DIM
+    asyncio.run(build_item_embeddings(dim))
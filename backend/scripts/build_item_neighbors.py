@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+# Load .env
+load_dotenv(BASE_DIR / ".env")
+
+from app.services.item_neighbors import (
+    DEFAULT_TOP_N,
+    ItemNeighbors,
+    build_neighbor_table,
+    default_table_dir,
+    load_neighbor_inputs,
+)
+
+async def build_item_neighbors(top_n: int = DEFAULT_TOP_N):
+    mysql_user = os.getenv("MYSQL_USER", "root")
+    mysql_password = os.getenv("MYSQL_PASSWORD", "")
+    mysql_host = os.getenv("MYSQL_HOST", "127.0.0.1")
+    mysql_port = os.getenv("MYSQL_PORT", "3306")
+    mysql_db = os.getenv("MYSQL_DB", "uni_rec")
+
+    if not mysql_password:
+        print("[Error] Please set MYSQL_PASSWORD in .env")
+        return
+
+    db_url = f"mysql+aiomysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_db}"
+    print(f"[MySQL] Connecting to {db_url.replace(mysql_password, '******')}...")
+
+    engine = create_async_engine(db_url, echo=False)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    try:
+        start = time.perf_counter()
+        async with async_session() as session:
+            print("[Data] Loading items and review histories...")
+            items, histories = await load_neighbor_inputs(session)
+
+        print(f"[Build] Computing top-{top_n} neighbors for {len(items)} items from {len(histories)} users...")
+        table = build_neighbor_table(items, histories, top_n=top_n)
+
+        # Write next to the live table and swap it in, so serving workers never read a half-written build
+        directory = default_table_dir()
+        staging = directory.with_name(f"{directory.name}.staging")
+        table.save(staging)
+        ItemNeighbors.publish(staging, directory)
+        print(f"[Success] Wrote {table.nnz} neighbor entries to {directory} in {time.perf_counter() - start:.1f}s")
+        await engine.dispose()
+
+    except Exception as e:
+        print(f"[Error] Build failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    top_n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TOP_N
+    asyncio.run(build_item_neighbors(top_n))
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Add project root to path
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+# Load .env
+load_dotenv(BASE_DIR / ".env")
+
+from app.models.sql_models import PrecomputedRec, Review, User
+from app.services.item_index import item_index
+from app.services.recommendation import sequence_items, social_recommend
+from app.services.scoring import fetch_recent_histories, sequence_scorer
+
+DEFAULT_TOP_K = 50
+DEFAULT_THRESHOLD = 5
+DEFAULT_CHUNK_SIZE = 500
+STORED_FIELDS = ("asin", "score", "source", "reason")
+
+
+async def compute_rows(
+    session: AsyncSession, reviewer_ids: List[str], top_k: int, threshold: int, version: int
+) -> List[Dict[str, Any]]:
+    """Same module choice and ranking as the online "auto" path, batched per chunk."""
+    index = await item_index.ensure(session)
+    result = await session.execute(
+        select(Review.reviewerID, func.count())
+        .where(Review.reviewerID.in_(reviewer_ids))
+        .group_by(Review.reviewerID)
+    )
+    counts = dict(result.all())
+
+    hot = [rid for rid in reviewer_ids if counts.get(rid, 0) >= threshold]
+    hot_set = set(hot)
+    histories = await fetch_recent_histories(session, hot)
+    ranked = sequence_scorer.score_batch([histories[rid] for rid in hot], top_k)
+    items_by_user = {rid: sequence_items(index, ranked_items) for rid, ranked_items in zip(hot, ranked)}
+    for rid in reviewer_ids:
+        if rid not in hot_set:
+            items_by_user[rid] = await social_recommend(session, rid, top_k, False)
+
+    return [
+        {
+            "reviewerID": rid,
+            "module": "sequence" if rid in hot_set else "social",
+            "startup_type": "hot" if rid in hot_set else "cold",
+            "behavior_count": counts.get(rid, 0),
+            "threshold": threshold,
+            "items": [{key: item[key] for key in STORED_FIELDS} for item in items_by_user[rid]],
+            "version": version,
+        }
+        for rid in reviewer_ids
+    ]
+
+
+async def _run_shard(
+    db_url: str, reviewer_ids: List[str], top_k: int, threshold: int, version: int, chunk_size: int
+) -> int:
+    engine = create_async_engine(db_url, echo=False)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    written = 0
+    try:
+        async with async_session() as session:
+            for start in range(0, len(reviewer_ids), chunk_size):
+                chunk = reviewer_ids[start:start + chunk_size]
+                rows = await compute_rows(session, chunk, top_k, threshold, version)
+                # Delete + insert instead of a dialect-specific upsert
+                await session.execute(delete(PrecomputedRec).where(PrecomputedRec.reviewerID.in_(chunk)))
+                await session.execute(insert(PrecomputedRec), rows)
+                await session.commit()
+                written += len(rows)
+    finally:
+        await engine.dispose()
+    return written
+
+
+def run_shard(db_url: str, reviewer_ids: List[str], top_k: int, threshold: int, version: int, chunk_size: int) -> int:
+    # Worker process entry point: each worker builds its own index, graph and engine
+    return asyncio.run(_run_shard(db_url, reviewer_ids, top_k, threshold, version, chunk_size))
+
+
+async def _load_user_ids(db_url: str) -> List[str]:
+    engine = create_async_engine(db_url, echo=False)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(select(User.reviewerID).order_by(User.reviewerID))
+            return [row[0] for row in result]
+    finally:
+        await engine.dispose()
+
+
+async def _drop_old_versions(db_url: str, version: int) -> int:
+    engine = create_async_engine(db_url, echo=False)
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(delete(PrecomputedRec).where(PrecomputedRec.version < version))
+            return result.rowcount or 0
+    finally:
+        await engine.dispose()
+
+
+def precompute(
+    db_url: str,
+    workers: int,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: int = DEFAULT_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    # Rows are stale for any activity at or after the batch start
+    version = int(time.time())
+    start = time.perf_counter()
+    reviewer_ids = asyncio.run(_load_user_ids(db_url))
+    workers = max(1, min(workers, len(reviewer_ids)))
+    shard_size = -(-len(reviewer_ids) // workers) if reviewer_ids else 0
+    shards = [reviewer_ids[i:i + shard_size] for i in range(0, len(reviewer_ids), shard_size)] if shard_size else []
+    print(f"[Precompute] {len(reviewer_ids)} users, top-{top_k}, {len(shards)} worker(s), version {version}")
+
+    written = 0
+    # spawn: workers must not inherit the parent's event loop or pooled connections
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(run_shard, db_url, shard, top_k, threshold, version, chunk_size) for shard in shards
+        ]
+        for future in as_completed(futures):
+            written += future.result()
+            elapsed = time.perf_counter() - start
+            print(f"[Precompute] {written}/{len(reviewer_ids)} users ({written / max(elapsed, 1e-9):.0f} users/s)")
+
+    dropped = asyncio.run(_drop_old_versions(db_url, version))
+    print(f"[Success] Wrote {written} rows in {time.perf_counter() - start:.1f}s, dropped {dropped} from older batches")
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute top-K recommendations for every user")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    mysql_user = os.getenv("MYSQL_USER", "root")
+    mysql_password = os.getenv("MYSQL_PASSWORD", "")
+    mysql_host = os.getenv("MYSQL_HOST", "127.0.0.1")
+    mysql_port = os.getenv("MYSQL_PORT", "3306")
+    mysql_db = os.getenv("MYSQL_DB", "uni_rec")
+
+    if not mysql_password:
+        print("[Error] Please set MYSQL_PASSWORD in .env")
+        return
+
+    db_url = f"mysql+aiomysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_db}"
+    print(f"[MySQL] Connecting to {db_url.replace(mysql_password, '******')}...")
+    precompute(db_url, args.workers, args.top_k, args.threshold, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
+import argparse
 import asyncio
 import json
 import sys
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,12 +13,13 @@ sys.path.append(str(BASE_DIR))
 # Load .env
 load_dotenv(BASE_DIR / ".env")
 
-from app.services.data_generator import generate_data
+from app.services.data_generator import generate_data, generate_data_chunks
+from app.services.snapshot import SnapshotWriter
 from app.core.config import settings
 
 DATA_DIR = Path(settings.data_dir) if settings.data_dir else BASE_DIR / "data"
 
-async def regenerate_snapshot():
+async def regenerate_snapshot(fmt: str = "json"):
     print("[Data] Generating new data (this may take a while)...")
     # Increase counts for better testing
     data = await generate_data(
@@ -28,17 +31,72 @@ async def regenerate_snapshot():
     )
     
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    snapshot = DATA_DIR / "snapshot.json"
-    
-    print(f"[Data] Writing to {snapshot}...")
-    snapshot.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if fmt == "ndjson":
+        snapshot = DATA_DIR / "snapshot"
+        print(f"[Data] Writing chunked snapshot to {snapshot}/...")
+        with SnapshotWriter(snapshot) as writer:
+            writer.write("users", data["users"].values())
+            writer.write("items", data["items"].values())
+            writer.write("reviews", data["reviews"])
+            writer.write("social_edges", data["social_edges"])
+    else:
+        snapshot = DATA_DIR / "snapshot.json"
+        print(f"[Data] Writing to {snapshot}...")
+        snapshot.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     
     print("[Success] Snapshot regenerated!")
     print(f"  - Users: {len(data['users'])}")
     print(f"  - Items: {len(data['items'])}")
     print(f"  - Reviews: {len(data['reviews'])}")
     print(f"  - Social Edges: {len(data['social_edges'])}")
-    print("\nNext step: Run 'python3 scripts/sync_sql.py' to update MySQL database.")
+    if fmt == "ndjson":
+        print(f"\nNext step: Run 'python3 scripts/sync_sql.py --snapshot {snapshot}' to update MySQL database.")
+    else:
+        print("\nNext step: Run 'python3 scripts/sync_sql.py' to update MySQL database.")
+
+def generate_scaled_snapshot(args: argparse.Namespace) -> None:
+    """Load-test sized dataset, streamed chunk by chunk into the NDJSON layout."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    snapshot = DATA_DIR / "snapshot"
+    print(f"[Data] Generating {args.users} users / {args.items} items into {snapshot}/...")
+    start = time.perf_counter()
+    with SnapshotWriter(snapshot) as writer:
+        for table, rows in generate_data_chunks(
+            users=args.users,
+            items=args.items,
+            behaviors_per_user=args.behaviors_per_user,
+            social_degree=args.social_degree,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+        ):
+            writer.write(table, rows)
+            print(f"  - {table}: {writer.counts[table]} rows ({time.perf_counter() - start:.1f}s)")
+    print("[Success] Snapshot regenerated!")
+    for table, count in writer.counts.items():
+        print(f"  - {table}: {count}")
+    print(f"\nNext step: Run 'python3 scripts/sync_sql.py --snapshot {snapshot}' to update MySQL database.")
 
 if __name__ == "__main__":
-    asyncio.run(regenerate_snapshot())
+    parser = argparse.ArgumentParser(description="Regenerate the synthetic data snapshot")
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="json: single snapshot.json; ndjson: per-table NDJSON files plus manifest",
+    )
+    parser.add_argument(
+        "--scale",
+        action="store_true",
+        help="vectorized power-law generator for load testing (always writes ndjson)",
+    )
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--behaviors-per-user", type=int, default=20)
+    parser.add_argument("--social-degree", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+    if args.scale:
+        generate_scaled_snapshot(args)
+    else:
+        asyncio.run(regenerate_snapshot(args.format))
@@ -1,10 +1,13 @@
+import argparse
 import asyncio
 import json
 import os
 import sys
+import time
 from pathlib import Path
+from typing import Any, Dict, Iterator, List
 from dotenv import load_dotenv
-from sqlalchemy import text
+from sqlalchemy import insert, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -16,8 +19,163 @@ sys.path.append(str(BASE_DIR))
 load_dotenv(BASE_DIR / ".env")
 
 from app.models.sql_models import Base, User, Item, Review, SocialEdge
+from app.services.snapshot import is_snapshot_dir, iter_table, verify_snapshot
 
-async def sync_to_mysql():
+SNAPSHOT_PATH = BASE_DIR / "data" / "snapshot.json"
+BULK_BATCH_SIZE = 5000
+
+
+def user_row(u: Dict[str, Any]) -> Dict[str, Any]:
+    return {"reviewerID": u["reviewerID"], "reviewerName": u.get("reviewerName"), "meta": u.get("meta")}
+
+
+def item_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "asin": item["asin"],
+        "title": item.get("title", ""),
+        "price": item.get("price", 0.0),
+        "brand": item.get("brand"),
+        "description": item.get("description"),
+        "feature": item.get("feature"),
+        "categories": item.get("categories"),
+        "also_buy": item.get("also_buy"),
+        "also_viewed": item.get("also_viewed"),
+        "imageURL": item.get("imageURL"),
+        "imageURLHighRes": item.get("imageURLHighRes"),
+    }
+
+
+def review_row(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "reviewerID": r["reviewerID"],
+        "asin": r["asin"],
+        "overall": r.get("overall", 0.0),
+        "reviewText": r.get("reviewText"),
+        "summary": r.get("summary"),
+        "unixReviewTime": r.get("unixReviewTime", 0),
+        "reviewTime": r.get("reviewTime"),
+        "vote": r.get("vote"),
+        "verified": r.get("verified", False),
+        "style": r.get("style"),
+        "image": r.get("image"),
+    }
+
+
+def edge_row(e: Dict[str, Any]) -> Dict[str, Any]:
+    return {"source": e["source"], "target": e["target"], "weight": e.get("weight", 0.0), "type": e.get("type")}
+
+
+# table -> (model, row builder, JSON prefixes in snapshot.json, stored as object or array)
+BULK_TABLES = {
+    "users": (User, user_row, ["users"], "object"),
+    "items": (Item, item_row, ["items"], "object"),
+    "reviews": (Review, review_row, ["reviews", "behaviors"], "array"),
+    "social_edges": (SocialEdge, edge_row, ["social_edges"], "array"),
+}
+
+
+def iter_snapshot_table(path: Path, table: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one table's raw records without loading the whole snapshot.
+
+    A chunked snapshot directory (manifest + NDJSON) is read line by line and
+    verified against the manifest. For snapshot.json the incremental parser
+    `ijson` is used when installed; otherwise it falls back to json.load
+    (whole-document, memory-bound).
+    """
+    if is_snapshot_dir(path):
+        yield from iter_table(path, table)
+        return
+
+    _, _, prefixes, kind = BULK_TABLES[table]
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    if ijson is None:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for prefix in prefixes:
+            if prefix in data:
+                values = data[prefix]
+                yield from (values.values() if kind == "object" else values)
+                return
+        return
+
+    for prefix in prefixes:
+        found = False
+        with open(path, "rb") as f:
+            if kind == "object":
+                records = (value for _, value in ijson.kvitems(f, prefix, use_float=True))
+            else:
+                records = ijson.items(f, f"{prefix}.item", use_float=True)
+            for record in records:
+                found = True
+                yield record
+        if found:
+            return
+
+
+async def bulk_insert_table(engine, table: str, rows: Iterator[Dict[str, Any]], batch_size: int) -> int:
+    """Core executemany INSERTs on a dedicated connection, one transaction per batch."""
+    model, build_row, _, _ = BULK_TABLES[table]
+    stmt = insert(model.__table__)
+    total = 0
+    start = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        nonlocal total
+        async with engine.begin() as conn:
+            await conn.execute(stmt, batch)
+        total += len(batch)
+        batch.clear()
+        elapsed = time.perf_counter() - start
+        print(f"  - {table}: {total} rows ({total / elapsed:,.0f} rows/s)")
+
+    for record in rows:
+        batch.append(build_row(record))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return total
+
+
+async def bulk_sync(engine, snapshot_path: Path, batch_size: int = BULK_BATCH_SIZE) -> None:
+    """
+    Bulk import: streamed parsing plus Core executemany INSERTs, no ORM objects.
+
+    users/items load concurrently, then reviews/social_edges (their foreign keys
+    point at the first two).
+    """
+    start = time.perf_counter()
+    counts: Dict[str, int] = {}
+    for phase in (("users", "items"), ("reviews", "social_edges")):
+        results = await asyncio.gather(
+            *(
+                bulk_insert_table(engine, table, iter_snapshot_table(snapshot_path, table), batch_size)
+                for table in phase
+            )
+        )
+        counts.update(zip(phase, results))
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"[Bulk] Loaded {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s): {counts}")
+
+
+async def clear_tables(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        await conn.execute(text("TRUNCATE TABLE social_edges"))
+        await conn.execute(text("TRUNCATE TABLE reviews"))
+        await conn.execute(text("TRUNCATE TABLE items"))
+        await conn.execute(text("TRUNCATE TABLE users"))
+        await conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+
+
+async def sync_to_mysql(bulk: bool = False, batch_size: int = BULK_BATCH_SIZE, snapshot_path: Path = SNAPSHOT_PATH):
     mysql_user = os.getenv("MYSQL_USER", "root")
     mysql_password = os.getenv("MYSQL_PASSWORD", "")
     mysql_host = os.getenv("MYSQL_HOST", "127.0.0.1")
@@ -37,10 +195,31 @@ async def sync_to_mysql():
     
     try:
         # Load snapshot data
-        snapshot_path = BASE_DIR / "data" / "snapshot.json"
         if not snapshot_path.exists():
             print(f"[Error] Snapshot file not found at {snapshot_path}")
             return
+        if is_snapshot_dir(snapshot_path) and not bulk:
+            print("[Sync] Chunked snapshot directory: using the bulk loader")
+            bulk = True
+
+        if is_snapshot_dir(snapshot_path):
+            # Batches are committed as they stream: reject a bad snapshot before touching the tables
+            print("[Sync] Verifying snapshot checksums...")
+            try:
+                verify_snapshot(snapshot_path)
+            except ValueError as e:
+                print(f"[Error] {e}; nothing was loaded")
+                await engine.dispose()
+                return
+
+        if bulk:
+            print("[Sync] Clearing existing tables...")
+            await clear_tables(engine)
+            print(f"[Bulk] Streaming {snapshot_path} (batch size {batch_size})...")
+            await bulk_sync(engine, snapshot_path, batch_size)
+            print("[Success] MySQL synchronization completed!")
+            await engine.dispose()
+            return
             
         print(f"[Data] Loading snapshot from {snapshot_path}...")
         with open(snapshot_path, "r", encoding="utf-8") as f:
@@ -161,4 +340,14 @@ async def sync_to_mysql():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    asyncio.run(sync_to_mysql())
+    parser = argparse.ArgumentParser(description="Load a data snapshot into MySQL")
+    parser.add_argument("--bulk", action="store_true", help="streamed Core bulk insert instead of ORM objects")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument(
+        "--snapshot",
+        type=Path,
+        default=SNAPSHOT_PATH,
+        help="snapshot.json or a chunked snapshot directory (implies --bulk)",
+    )
+    args = parser.parse_args()
+    asyncio.run(sync_to_mysql(bulk=args.bulk, batch_size=args.batch_size, snapshot_path=args.snapshot))
@@ -121,7 +121,8 @@ export default function App() {
           } else if (ev.event === "reasoning") {
             // Can display incremental reasoning if needed
           } else if (ev.event === "update") {
-            setRecommendations(data.items)
+            // Delta: fields to set on every recommended item
+            setRecommendations(prev => prev.map(item => ({ ...item, ...data.item_fields })))
           }
         },
         onerror(err) {
@@ -36,4 +36,13 @@ export const requestRecommend = (payload: RecommendPayload) => client.post("/rec
 export const sendFeedback = (payload: FeedbackPayload) => client.post("/feedback", payload)
 export const fetchMetrics = () => client.get("/metrics")
 export const generateData = (payload: GeneratePayload) => client.post("/data/generate", payload)
-export const fetchUsers = () => client.get("/users")
+export type UsersPage = {
+  users: { reviewerID: string; reviewerName: string }[]
+  nextCursor?: string
+}
+
+// One page of users; pass nextCursor back to load the following page
+export const fetchUsers = async (params: { prefix?: string; cursor?: string; limit?: number } = {}): Promise<UsersPage> => {
+  const res = await client.get("/users", { params: { limit: 100, ...params } })
+  return { users: res.data, nextCursor: res.headers["x-next-cursor"] as string | undefined }
+}
@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react"
+import { UIEvent, useEffect, useRef, useState } from "react"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Input } from "@/components/ui/input"
@@ -29,15 +29,47 @@ type Props = {
 
 export default function ControlPanel({ params, onChange, onGenerate, onRecommend, loading }: Props) {
   const [users, setUsers] = useState<User[]>([])
+  const [prefix, setPrefix] = useState("")
+  const [nextCursor, setNextCursor] = useState<string | undefined>()
+  const [loadingMore, setLoadingMore] = useState(false)
+  // Responses for an older prefix are dropped
+  const requestId = useRef(0)
 
+  // First page for the current prefix (debounced while typing); more pages load on scroll
   useEffect(() => {
-    fetchUsers().then(res => {
-      setUsers(res.data)
-      if (res.data.length > 0 && !params.reviewerID) {
-        update("reviewerID", res.data[0].reviewerID)
-      }
-    })
-  }, [])
+    const id = ++requestId.current
+    const timer = setTimeout(() => {
+      fetchUsers({ prefix: prefix || undefined }).then(page => {
+        if (id !== requestId.current) return
+        setUsers(page.users)
+        setNextCursor(page.nextCursor)
+        if (page.users.length > 0 && !params.reviewerID) {
+          update("reviewerID", page.users[0].reviewerID)
+        }
+      })
+    }, 300)
+    return () => clearTimeout(timer)
+  }, [prefix])
+
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return
+    const id = requestId.current
+    setLoadingMore(true)
+    fetchUsers({ prefix: prefix || undefined, cursor: nextCursor })
+      .then(page => {
+        if (id !== requestId.current) return
+        setUsers(prev => [...prev, ...page.users])
+        setNextCursor(page.nextCursor)
+      })
+      .finally(() => setLoadingMore(false))
+  }
+
+  const onListScroll = (e: UIEvent<HTMLElement>) => {
+    const el = e.target as HTMLElement
+    if (el.scrollTop + el.clientHeight >= el.scrollHeight - 40) {
+      loadMore()
+    }
+  }
 
   const update = (key: keyof Params, value: string | number | boolean) => {
     onChange({ ...params, [key]: value })
@@ -51,11 +83,17 @@ export default function ControlPanel({ params, onChange, onGenerate, onRecommend
       <CardContent className="space-y-4">
         <div className="space-y-2">
           <Label>选择用户 (reviewerID)</Label>
+          <Input
+            placeholder="按 reviewerID 前缀搜索"
+            value={prefix}
+            onChange={(e) => setPrefix(e.target.value.trim())}
+          />
           <Select value={params.reviewerID} onValueChange={(val) => update("reviewerID", val)}>
             <SelectTrigger>
               <SelectValue placeholder="Select user" />
             </SelectTrigger>
-            <SelectContent>
+            {/* Scroll does not bubble; capture it from the viewport inside the popover */}
+            <SelectContent onScrollCapture={onListScroll}>
               {users.map(u => (
                 <SelectItem key={u.reviewerID} value={u.reviewerID}>
                   {u.reviewerName} ({u.reviewerID})